@@ -23,13 +23,18 @@ from __future__ import print_function
 
 from collections import OrderedDict
 from collections.abc import Sequence
+from functools import lru_cache
 import logging
-from math import sqrt, log
+from math import ceil, log, log2, pi, sqrt, tan
 import os.path
 
 import numpy as np
-from scipy.interpolate import interp1d
+from scipy.fft import irfft, next_fast_len, rfft, rfftfreq
+from scipy.signal import choose_conv_method, convolve
+from scipy.sparse import csr_matrix
+from scipy.special import erfcinv, voigt_profile
 
+import galore.cache
 import galore.formats
 from galore.cross_sections import get_cross_sections, cross_sections_info
 
@@ -55,14 +60,20 @@ def process_1d_data(input=['vasprun.xml'],
                     gaussian=None, lorentzian=None,
                     sampling=1e-2,
                     xmin=None, xmax=None,
-                    spikes=False,
-                    **kwargs):
+                    spikes=False, tolerance=None, method='auto',
+                    dtype=np.float64, rebin=False, cache_dir=None,
+                    cache_size=galore.cache.DEFAULT_CACHE_SIZE, **kwargs):
     """Read 1D data series from files, process for output
 
     Args:
         input (str or 1-list):
             Input data file. Pass as either a string or a list containing one
             string
+        cache_dir (str):
+            Directory in which to cache data read from input files; see
+            :mod:`galore.cache`
+        cache_size (int):
+            Limit on total size of cache files in bytes
         **kwargs:
             See main command reference
 
@@ -73,6 +84,86 @@ def process_1d_data(input=['vasprun.xml'],
 
     """
 
+    _check_resampling(spikes=spikes, rebin=rebin)
+    xy_data, x_values = _read_1d_input(input, sampling=sampling, xmin=xmin,
+                                       xmax=xmax, cache_dir=cache_dir,
+                                       cache_size=cache_size)
+
+    d = sampling
+    broadening = _broadening_params(gaussian=gaussian, lorentzian=lorentzian)
+
+    if (spikes and broadening is not None and method == 'auto'
+            and _is_fixed_width(broadening[1])
+            and _prefer_line_sum(len(xy_data), len(x_values), d, *broadening,
+                                 tolerance=tolerance)):
+        dist, width = broadening
+        broadened_data = galore.broaden_lines(xy_data, x_values,
+                                              dist=dist, width=width,
+                                              tolerance=tolerance,
+                                              dtype=dtype)
+    else:
+        data_1d = galore.xy_to_1d(xy_data, x_values, spikes=spikes,
+                                  dtype=dtype, rebin=rebin)
+        broadened_data = _apply_broadening(data_1d, d=d, gaussian=gaussian,
+                                           lorentzian=lorentzian,
+                                           x_values=x_values,
+                                           tolerance=tolerance, method=method)
+
+    return (x_values, broadened_data)
+
+
+def sweep_1d_data(input=['vasprun.xml'],
+                  gaussians=None, lorentzians=None,
+                  sampling=1e-2,
+                  xmin=None, xmax=None,
+                  spikes=False, tolerance=None, method='fft',
+                  dtype=np.float64, rebin=False, cache_dir=None,
+                  cache_size=galore.cache.DEFAULT_CACHE_SIZE, **kwargs):
+    """Read 1D data series from file and broaden with a series of widths
+
+    The input is read and resampled once; see :func:`broaden_sweep`.
+
+    Args:
+        input (str or 1-list):
+            Input data file. Pass as either a string or a list containing one
+            string
+        gaussians (float or iterable): Gaussian widths
+        lorentzians (float or iterable): Lorentzian widths, paired with
+            gaussians
+        **kwargs:
+            See main command reference
+
+    Returns:
+        3-tuple (np.ndarray, np.ndarray, np.ndarray):
+            Resampled x-values; (n_widths, 2) array of (lorentzian, gaussian)
+            widths; (n_widths, n_points) array of broadened data
+    """
+    xy_data, x_values = _read_1d_input(input, sampling=sampling, xmin=xmin,
+                                       xmax=xmax, cache_dir=cache_dir,
+                                       cache_size=cache_size)
+    data_1d = galore.xy_to_1d(xy_data, x_values, spikes=spikes, dtype=dtype,
+                              rebin=rebin)
+
+    widths = _sweep_widths(gaussians=gaussians, lorentzians=lorentzians)
+    broadened_data = galore.broaden_sweep(
+        data_1d, d=sampling, gaussians=widths[:, 1], lorentzians=widths[:, 0],
+        tolerance=tolerance, method=method)
+
+    return (x_values, widths, broadened_data)
+
+
+def _read_1d_input(input, sampling=1e-2, xmin=None, xmax=None,
+                   cache_dir=None, cache_size=galore.cache.DEFAULT_CACHE_SIZE):
+    """Read x, y data from a single input file of any supported format
+
+    Data is cached in cache_dir if given; see :func:`galore.cache.cached_read`
+
+    Returns:
+        2-tuple (np.ndarray, np.ndarray): x, y data and evenly-spaced
+        x-values for output (see :func:`_x_mesh`). GPAW data is evaluated
+        directly on these x-values.
+    """
+
     if type(input) == str:
         pass
     elif len(input) > 1:
@@ -84,18 +175,26 @@ def process_1d_data(input=['vasprun.xml'],
     if not os.path.exists(input):
         raise Exception(
             "Input file {0} does not exist!".format(input))
-    if galore.formats.is_xml(input):
-        xy_data = galore.formats.read_vasprun_totaldos(input)
-    elif galore.formats.is_gpw(input):
-        xy_data = galore.formats.read_gpaw_totaldos(input)
-    elif galore.formats.is_doscar(input):
-        xy_data = galore.formats.read_doscar(input)
-    elif galore.formats.is_vasp_raman(input):
-        xy_data = galore.formats.read_vasp_raman(input)
-    elif galore.formats.is_csv(input):
-        xy_data = galore.formats.read_csv(input)
-    else:
-        xy_data = galore.formats.read_txt(input)
+
+    input_format = galore.formats.detect_format(input)
+    reader = galore.formats.INPUT_FORMATS[input_format]['reader']
+    if reader is None:
+        raise ValueError('Input format "{0}" only provides orbital-projected '
+                         'data; use process_pdos.'.format(input_format))
+
+    if input_format == 'gpaw':
+        xy_data = galore.cache.cached_read(
+            reader, input, cache_dir=cache_dir, max_size=cache_size,
+            sampling=sampling, xmin=xmin, xmax=xmax)
+        return xy_data, xy_data[:, 0]
+
+    xy_data = galore.cache.cached_read(reader, input, cache_dir=cache_dir,
+                                       max_size=cache_size)
+    return xy_data, _x_mesh(xy_data, sampling=sampling, xmin=xmin, xmax=xmax)
+
+
+def _x_mesh(xy_data, sampling=1e-2, xmin=None, xmax=None):
+    """Get evenly-spaced x-values covering data, unless limits are given"""
 
     # Add 5% to data range if not specified
     auto_xmin, auto_xmax = auto_limits(xy_data[:, 0], padding=0.05)
@@ -104,26 +203,16 @@ def process_1d_data(input=['vasprun.xml'],
     if xmin is None:
         xmin = auto_xmin
 
-    d = sampling
-    x_values = np.arange(xmin, xmax, d)
-    data_1d = galore.xy_to_1d(xy_data, x_values, spikes=spikes)
-
-    broadened_data = data_1d.copy()
-    if lorentzian:
-        broadened_data = galore.broaden(
-            broadened_data, d=d, dist='lorentzian', width=lorentzian)
-
-    if gaussian:
-        broadened_data = galore.broaden(
-            broadened_data, d=d, dist='gaussian', width=gaussian)
-
-    return (x_values, broadened_data)
+    return np.arange(xmin, xmax, sampling)
 
 
 def process_pdos(input=['vasprun.xml'],
                  gaussian=None, lorentzian=None,
                  weighting=None, sampling=1e-2,
-                 xmin=None, xmax=None, flipx=False, **kwargs):
+                 xmin=None, xmax=None, flipx=False, tolerance=None,
+                 method='auto', dtype=np.float64, rebin=False,
+                 cache_dir=None, cache_size=galore.cache.DEFAULT_CACHE_SIZE,
+                 nproc=1, **kwargs):
     """Read PDOS from files, process for output
 
     Args:
@@ -134,6 +223,17 @@ def process_pdos(input=['vasprun.xml'],
                 `pymatgen.electronic_structure.dos.CompleteDos` can be
                 provided. Spin channels indicated by an (up) or (down) suffix
                 in file header will be combined for each orbital type.
+                A VASP DOSCAR with projected data may also be used; species
+                are read from CONTCAR or POSCAR in the same directory
+                (see :func:`galore.formats.read_doscar_pdos`).
+        cache_dir (str):
+            Directory in which to cache data read from input files; see
+            :mod:`galore.cache`
+        cache_size (int):
+            Limit on total size of cache files in bytes
+        nproc (int):
+            Number of processes used to read projected DOS from GPAW files
+            (see :func:`galore.formats.read_gpaw_pdos`)
         **kwargs:
             See main command reference
 
@@ -149,24 +249,54 @@ def process_pdos(input=['vasprun.xml'],
         input = [input]
 
     # Read files into dict, check for consistency
+    x_values = None
     energy_label = None
     pdos_data = OrderedDict()
+    def _read(reader, filename, **reader_kwargs):
+        return galore.cache.cached_read(reader, filename,
+                                        cache_dir=cache_dir,
+                                        max_size=cache_size, **reader_kwargs)
+
     for pdos_file in input:
-        if (galore.formats.is_complete_dos(pdos_file)
-                or galore.formats.is_xml(pdos_file)):
+        if galore.formats.is_complete_dos(pdos_file):
             pdos_data = galore.formats.read_vasprun_pdos(pdos_file)
             kwargs['units'] = 'eV'
             break
 
-        elif galore.formats.is_gpw(pdos_file):
-            pdos_data = galore.formats.read_gpaw_pdos(pdos_file)
-            kwargs['units'] = 'eV'
-            break
-
         if not os.path.exists(pdos_file):
             raise Exception("Input file {0} does not "
                             "exist!".format(input))
 
+        input_format = galore.formats.detect_format(pdos_file)
+        pdos_reader = galore.formats.INPUT_FORMATS[input_format][
+            'pdos_reader']
+
+        if input_format == 'gpaw':
+            # Unless limits are reversed for binding energies, GPAW PDOS is
+            # evaluated directly on the output mesh
+            mesh_kwargs = ({} if flipx else
+                           dict(sampling=sampling, xmin=xmin, xmax=xmax))
+            pdos_data = _read(pdos_reader, pdos_file,
+                              nproc=nproc, **mesh_kwargs)
+            kwargs['units'] = 'eV'
+            if mesh_kwargs:
+                x_values = list(pdos_data.values())[0]['energy']
+            break
+
+        elif input_format == 'doscar':
+            structure_files = [os.path.join(os.path.dirname(pdos_file), name)
+                               for name in ('CONTCAR', 'POSCAR')]
+            pdos_data = _read(pdos_reader, pdos_file,
+                              related_files=structure_files)
+            kwargs['units'] = 'eV'
+            break
+
+        elif pdos_reader is not None:
+            pdos_data = _read(pdos_reader, pdos_file)
+            if input_format == 'vasprun':
+                kwargs['units'] = 'eV'
+            break
+
         basename = os.path.basename(pdos_file)
         try:
             element = basename.split("_")[-2]
@@ -177,7 +307,7 @@ def process_pdos(input=['vasprun.xml'],
                             "and EXT are labels of your choice. We recommend"
                             "SYSTEM_EL_dos.dat")
 
-        data = galore.formats.read_pdos_txt(pdos_file)
+        data = _read(galore.formats.read_pdos_txt, pdos_file)
 
         if energy_label is None:
             energy_label = data.dtype.names[0]
@@ -198,58 +328,152 @@ def process_pdos(input=['vasprun.xml'],
     # In x-flip mode, the user specifies these as binding energies so values
     # are reversed while treating DOS data.
     d = sampling
-    limits = (auto_limits(data['energy'], padding=0.05)
-              for (element, data) in pdos_data.items())
-    xmins, xmaxes = zip(*limits)
+    if x_values is None:
+        limits = (auto_limits(data['energy'], padding=0.05)
+                  for (element, data) in pdos_data.items())
+        xmins, xmaxes = zip(*limits)
+
+        if xmax is None:
+            xmax = max(xmaxes)
+
+        if xmin is None:
+            xmin = min(xmins)
+
+        if flipx:
+            xmin, xmax = -xmax, -xmin
+
+        x_values = np.arange(xmin, xmax, d)
+
+    # Resample data into rows of a single workspace array, which is then
+    # broadened in-place; output channels are views of its rows
+    channels = [(element, orbital)
+                for element, el_data in pdos_data.items()
+                for orbital, orb_data in el_data.items()
+                if orbital != 'energy' and orb_data is not None]
+    workspace = np.empty((len(channels), len(x_values)), dtype=dtype)
+
+    # Channels on a common energy grid (e.g. all of a vasprun.xml file) are
+    # resampled together with a single sparse matrix product
+    for energies, rows in _group_by_grid(
+            [pdos_data[element]['energy'] for element, _ in channels]):
+        resampling = galore.resampling_matrix(energies, x_values,
+                                              rebin=rebin)
+        orbital_data = np.column_stack(
+            [pdos_data[element][orbital]
+             for element, orbital in (channels[row] for row in rows)])
+        workspace[rows] = (resampling @ orbital_data).T
+
+    # Broaden all channels together
+    if channels:
+        _apply_broadening(workspace, d=d, gaussian=gaussian,
+                          lorentzian=lorentzian, x_values=x_values,
+                          tolerance=tolerance, method=method)
+
+    pdos_plotting_data = OrderedDict(
+        (element, OrderedDict([('energy', x_values)]))
+        for element in pdos_data)
+    for (element, orbital), row in zip(channels, workspace):
+        pdos_plotting_data[element][orbital] = row
 
-    if xmax is None:
-        xmax = max(xmaxes)
+    if weighting:
+        cross_sections = galore.get_cross_sections(weighting,
+                                                   elements=pdos_data.keys())
+        pdos_plotting_data = galore.apply_orbital_weights(
+            pdos_plotting_data, cross_sections)
 
-    if xmin is None:
-        xmin = min(xmins)
+    return pdos_plotting_data
 
-    if flipx:
-        xmin, xmax = -xmax, -xmin
 
-    x_values = np.arange(xmin, xmax, d)
+def _group_by_grid(grids):
+    """Find the indices of identical arrays in a list
 
-    # Resample data into new dictionary
-    pdos_plotting_data = OrderedDict()
-    for element, el_data in pdos_data.items():
-        pdos_plotting_data[element] = OrderedDict([('energy', x_values)])
-        for orbital, orb_data in el_data.items():
-            if orbital == 'energy':
-                continue
-            elif orb_data is None:
-                continue
+    Returns:
+        list: 2-tuples of (array, list of indices at which it occurs)
+    """
+    groups = []
+    for i, grid in enumerate(grids):
+        for group_grid, indices in groups:
+            if grid is group_grid or np.array_equal(grid, group_grid):
+                indices.append(i)
+                break
+        else:
+            groups.append((grid, [i]))
+    return groups
 
-            xy_data = np.column_stack([el_data['energy'], orb_data])
 
-            pdos_resampled = galore.xy_to_1d(xy_data, x_values)
-            broadened_data = pdos_resampled.copy()
+def _broadening_params(gaussian=None, lorentzian=None):
+    """Get distribution and width for Lorentzian and/or Gaussian broadening
 
-            if lorentzian:
-                broadened_data = galore.broaden(broadened_data, d=d,
-                                                dist='lorentzian',
-                                                width=lorentzian)
+    If both widths are given, a single Voigt function is used. Widths may be
+    numbers, arrays or functions (for energy-dependent broadening).
 
-            if gaussian:
-                broadened_data = galore.broaden(broadened_data, d=d,
-                                                dist='gaussian',
-                                                width=gaussian)
+    Returns:
+        2-tuple (str, float or tuple) or None if no broadening is requested
+    """
+    def _is_set(width):
+        return callable(width) or np.ndim(width) > 0 or bool(width)
+
+    if _is_set(lorentzian) and _is_set(gaussian):
+        return ('voigt', (lorentzian, gaussian))
+    elif _is_set(lorentzian):
+        return ('lorentzian', lorentzian)
+    elif _is_set(gaussian):
+        return ('gaussian', gaussian)
+    else:
+        return None
 
-            pdos_plotting_data[element][orbital] = broadened_data
 
-    if weighting:
-        cross_sections = galore.get_cross_sections(weighting,
-                                                   elements=pdos_data.keys())
-        pdos_plotting_data = galore.apply_orbital_weights(
-            pdos_plotting_data, cross_sections)
+def _apply_broadening(data, d, gaussian=None, lorentzian=None,
+                      x_values=None, tolerance=None, method='auto'):
+    """Apply Lorentzian and/or Gaussian broadening to resampled data in-place
 
-    return pdos_plotting_data
+    Returns:
+        np.array: data, broadened
+    """
+    broadening = _broadening_params(gaussian=gaussian, lorentzian=lorentzian)
+    if broadening is None:
+        return data
+
+    dist, width = broadening
+    return galore.broaden(data, d=d, dist=dist, width=width,
+                          x_values=x_values, tolerance=tolerance,
+                          method=method, out=data)
 
 
-def xy_to_1d(xy, x_values, spikes=False):
+def _sweep_widths(gaussians=None, lorentzians=None):
+    """Pair up Gaussian and Lorentzian widths for a broadening sweep
+
+    Scalars and None (i.e. zero) are broadcast against sequences.
+
+    Returns:
+        np.ndarray: (n_widths, 2) array of (lorentzian, gaussian) widths
+    """
+    gaussians = np.atleast_1d(0 if gaussians is None else gaussians)
+    lorentzians = np.atleast_1d(0 if lorentzians is None else lorentzians)
+    lorentzians, gaussians = np.broadcast_arrays(lorentzians.astype(float),
+                                                 gaussians.astype(float))
+    return np.column_stack([lorentzians, gaussians])
+
+
+def _prefer_line_sum(n_lines, n_points, d, dist, width, pad=False,
+                     tolerance=None):
+    """Estimate whether broaden_lines is cheaper than spikes + convolution
+
+    Direct summation costs one line shape evaluation per line per point of
+    the cutoff window, while convolution costs an FFT over the full mesh.
+    Voigt functions are roughly an order of magnitude more expensive to
+    evaluate than Lorentzians or Gaussians.
+    """
+    cutoff, _ = _line_cutoff(dist, width, pad, d=d, tolerance=tolerance)
+    n_window = 2 * int(cutoff / d) + 1
+    n_fft = n_points + n_window
+    cost_per_point = 40 if dist.lower() == 'voigt' else 5
+
+    return n_lines * n_window * cost_per_point < n_fft * log2(n_fft)
+
+
+def xy_to_1d(xy, x_values, spikes=False, dtype=np.float64, out=None,
+             rebin=False):
     """Convert a set of x,y coordinates to 1D array
 
     Data is resampled to a given sequence of regularly-spaced x-values. By
@@ -261,9 +485,27 @@ def xy_to_1d(xy, x_values, spikes=False):
     x-value by subtracting d/2 and rounding up. d is determined by examining
     the first two elements of x_values.
 
+    With ``spikes='linear'``, each y-value is instead divided between the two
+    neighbouring x-values in proportion to their proximity ("cloud-in-cell"
+    deposition). This conserves the centroid of each level as well as its
+    intensity, so a coarser mesh may be used before broadening.
+
+    If the mesh is coarser than the data, interpolation skips over features
+    between mesh points and does not conserve the area under the data. With
+    ``rebin=True`` each resampled value is instead the mean of the linearly
+    interpolated data over the bin of width d centred on its x-value, so
+    that the area is conserved.
+
     Args:
         xy: (ndarray) 2D numpy array of x, y values
         x_values: (iterable) An evenly-spaced x-value mesh
+        spikes: (bool or str) Resample as spikes on nearest x-value (True)
+            or shared between neighbouring x-values ("linear")
+        dtype: (str or np.dtype) Floating-point type of resampled data
+        out: (np.array) Optional array of the same length as x_values in
+            which to place the result
+        rebin: (bool) Average distribution data over bins rather than
+            interpolating
     Returns:
         (np.array): re-sampled y values corresponding to x_values
     """
@@ -274,28 +516,207 @@ def xy_to_1d(xy, x_values, spikes=False):
 
     # Structured arrays are allowed, in which case first field is x,
     # second is y. A bit of hackery is needed to slice these interchangeably.
-    if xy.dtype.names is None:
-        x_field, y_field = (Ellipsis, 0), (Ellipsis, 1)
-    else:
-        x_field, y_field = xy.dtype.names
+    x_field, y_field = _xy_fields(xy)
+
+    _check_resampling(spikes=spikes, rebin=rebin)
+
+    if spikes == 'linear':
+        resampled = _deposit_linear(np.asarray(xy[x_field], dtype=float),
+                                    np.asarray(xy[y_field], dtype=float),
+                                    x_values[0], d, n_x_values)
 
-    if spikes:
-        spikes = np.zeros(n_x_values)
+    elif spikes:
         spike_locations = x_values.searchsorted(xy[x_field] - (0.5 * d))
 
-        for location, value in zip(spike_locations, xy[y_field]):
-            if location == 0 or location == n_x_values:
-                pass
-            else:
-                spikes[location] += value
+        # Values falling before the first or after the last x-value are
+        # discarded, as is any value placed on the first x-value
+        in_range = (spike_locations != 0) & (spike_locations != n_x_values)
+        resampled = np.bincount(spike_locations[in_range],
+                                weights=np.asarray(xy[y_field])[in_range],
+                                minlength=n_x_values)
+
+    elif rebin:
+        x, y = _sorted_xy(np.asarray(xy[x_field], dtype=float),
+                          np.asarray(xy[y_field], dtype=float))
+        resampled = _rebin(x, y, x_values[0], d, n_x_values)
 
-        return spikes
+    else:
+        x, y = _sorted_xy(np.asarray(xy[x_field]), np.asarray(xy[y_field]))
+        resampled = np.interp(x_values, x, y, left=0, right=0)
 
+    if out is None:
+        return resampled.astype(dtype, copy=False)
     else:
-        y_func = interp1d(xy[x_field], xy[y_field],
-                          assume_sorted=False,
-                          bounds_error=False, fill_value=0)
-        return y_func(x_values)
+        out[...] = resampled
+        return out
+
+
+def _check_resampling(spikes=False, rebin=False):
+    """Raise ValueError if resampling options are incompatible"""
+    if rebin and spikes:
+        raise ValueError('Spikes cannot be rebinned; rebinning only applies '
+                         'to distribution data.')
+
+
+def _rebin(x, y, x0, d, n_x_values):
+    """Average piecewise-linear data over bins of width d centred on mesh
+
+    The cumulative integral of the data is evaluated at the bin edges; its
+    differences are the bin areas. x must be in increasing order.
+    """
+    if x.size < 2:
+        return np.zeros(n_x_values)
+
+    steps = np.diff(x)
+    cumulative = np.concatenate([[0.], np.cumsum(0.5 * steps
+                                                 * (y[:-1] + y[1:]))])
+    slopes = np.divide(np.diff(y), steps, out=np.zeros_like(steps),
+                       where=(steps > 0))
+
+    edges = np.clip(x0 + d * (np.arange(n_x_values + 1) - 0.5), x[0], x[-1])
+    lower = np.clip(x.searchsorted(edges, side='right') - 1, 0, x.size - 2)
+    offsets = edges - x[lower]
+    integral = (cumulative[lower] + y[lower] * offsets
+                + 0.5 * slopes[lower] * offsets**2)
+
+    return np.diff(integral) / d
+
+
+def resampling_matrix(x, x_values, spikes=False, rebin=False):
+    """Get resampling by :func:`xy_to_1d` as a sparse matrix
+
+    The matrix depends only on the source x-values and the target mesh, so
+    it can be computed once and applied to any number of data series on the
+    same source grid::
+
+        resampled = resampling_matrix(x, x_values) @ y
+
+    Results agree with :func:`xy_to_1d` to within floating-point rounding.
+
+    Args:
+        x: (np.array) Source x-values
+        x_values: (iterable) An evenly-spaced x-value mesh
+        spikes: (bool or str) Resampling mode, as for :func:`xy_to_1d`
+        rebin: (bool) Average over bins, as for :func:`xy_to_1d`
+
+    Returns:
+        (scipy.sparse.csr_matrix): (len(x_values), len(x)) resampling matrix
+    """
+    x = np.asarray(x, dtype=float)
+    x_values = np.array(x_values, dtype=float)
+    n_x_values = x_values.size
+    d = x_values[1] - x_values[0]
+    columns = np.arange(x.size)
+
+    _check_resampling(spikes=spikes, rebin=rebin)
+
+    if spikes == 'linear':
+        position = (x - x_values[0]) / d
+        lower = np.floor(position).astype(int)
+        frac = position - lower
+        rows = np.concatenate([lower, lower + 1])
+        columns = np.concatenate([columns, columns])
+        weights = np.concatenate([1 - frac, frac])
+        in_range = (rows >= 0) & (rows < n_x_values)
+
+    elif spikes:
+        rows = x_values.searchsorted(x - (0.5 * d))
+        weights = np.ones(x.size)
+        in_range = (rows != 0) & (rows != n_x_values)
+
+    elif rebin:
+        # Integrate the interpolated data exactly over the elementary
+        # intervals between consecutive source points and bin edges
+        x_sorted, order = _sorted_xy(x, columns)
+        edges = x_values[0] + d * (np.arange(n_x_values + 1) - 0.5)
+        breaks = np.union1d(x_sorted, np.clip(edges, x_sorted[0],
+                                              x_sorted[-1]))
+        starts, ends = breaks[:-1], breaks[1:]
+        midpoints = 0.5 * (starts + ends)
+
+        lower = np.clip(x_sorted.searchsorted(midpoints, side='right') - 1,
+                        0, max(x.size - 2, 0))
+        upper = np.minimum(lower + 1, x.size - 1)
+        steps = x_sorted[upper] - x_sorted[lower]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            start_frac = (starts - x_sorted[lower]) / steps
+            end_frac = (ends - x_sorted[lower]) / steps
+        start_frac = np.where(np.isfinite(start_frac), start_frac, 0.)
+        end_frac = np.where(np.isfinite(end_frac), end_frac, 0.)
+
+        bins = np.floor((midpoints - edges[0]) / d).astype(int)
+        area = 0.5 * (ends - starts) / d
+        rows = np.concatenate([bins, bins])
+        columns = np.concatenate([order[lower], order[upper]])
+        weights = np.concatenate([area * (2 - start_frac - end_frac),
+                                  area * (start_frac + end_frac)])
+        in_range = (rows >= 0) & (rows < n_x_values) & (weights != 0)
+
+    else:
+        # Interpolate between the neighbouring source points of each target
+        x_sorted, order = _sorted_xy(x, columns)
+        rows = np.flatnonzero((x_values >= x_sorted[0])
+                              & (x_values <= x_sorted[-1]))
+        lower = np.clip(x_sorted.searchsorted(x_values[rows], side='right')
+                        - 1, 0, max(x.size - 2, 0))
+        upper = np.minimum(lower + 1, x.size - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = ((x_values[rows] - x_sorted[lower])
+                    / (x_sorted[upper] - x_sorted[lower]))
+        frac = np.where(np.isfinite(frac), frac, 0.)
+
+        rows = np.concatenate([rows, rows])
+        columns = np.concatenate([order[lower], order[upper]])
+        weights = np.concatenate([1 - frac, frac])
+        in_range = weights != 0
+
+    return csr_matrix((weights[in_range],
+                       (rows[in_range], columns[in_range])),
+                      shape=(n_x_values, x.size))
+
+
+def _deposit_linear(x, y, x0, d, n_x_values):
+    """Share values between neighbouring points of an evenly-spaced mesh
+
+    Contributions falling outside the mesh are discarded.
+    """
+    position = (x - x0) / d
+    lower = np.floor(position).astype(int)
+    frac = position - lower
+
+    resampled = np.zeros(n_x_values)
+    for index, weights in ((lower, y * (1 - frac)), (lower + 1, y * frac)):
+        in_range = (index >= 0) & (index < n_x_values)
+        resampled += np.bincount(index[in_range], weights=weights[in_range],
+                                 minlength=n_x_values)
+    return resampled
+
+
+def _sorted_xy(x, y):
+    """Get x, y data in order of increasing x
+
+    Data which is already monotonic (as most DOS data is) is not sorted;
+    otherwise a stable sort is used.
+    """
+    steps = np.diff(x)
+    if np.all(steps >= 0):
+        return x, y
+    elif np.all(steps <= 0):
+        return x[::-1], y[::-1]
+    else:
+        order = np.argsort(x, kind='mergesort')
+        return x[order], y[order]
+
+
+def _xy_fields(xy):
+    """Get indices for x and y values of 2D array or structured array"""
+
+    # Structured arrays are allowed, in which case first field is x,
+    # second is y. A bit of hackery is needed to slice these interchangeably.
+    if xy.dtype.names is None:
+        return (Ellipsis, 0), (Ellipsis, 1)
+    else:
+        return xy.dtype.names[:2]
 
 
 def delta(f1, f2, w=1):
@@ -332,22 +753,647 @@ def gaussian(f, f0=0, fwhm=1):
     return np.exp(-np.power(f - f0, 2) / (2 * c**2))
 
 
-def broaden(data, dist='lorentz', width=2, pad=False, d=1):
+def voigt(f, f0=0, fwhm_l=1, fwhm_g=1):
+    """Voigt function centered on f0
+
+    This is the convolution of :func:`lorentzian` and :func:`gaussian`, using
+    the same normalisation conventions; i.e. its area is that of the Gaussian.
+
+    Args:
+        f (np.array): 1D array of x-values (e.g. frequencies)
+        f0 (float): Origin of function
+        fwhm_l (float): full-width half-maximum (FWHM) of Lorentzian component
+        fwhm_g (float): full-width half-maximum (FWHM) of Gaussian component
+
+    """
+    c = fwhm_g / (2 * sqrt(2 * log(2)))
+    return (c * sqrt(2 * np.pi)
+            * voigt_profile(np.asarray(f) - f0, c, 0.5 * fwhm_l))
+
+
+def broaden(data, dist='lorentz', width=2, pad=False, d=1, method='auto',
+            x_values=None, tolerance=None, dtype=None, out=None):
     """Given a 1d data set, use convolution to apply a broadening function
 
     Args:
-        data (np.array): 1D array of data points to broaden
-        dist (str): Type of distribution used for broadening. Currently only
-            "Lorentz" is supported.
-        width (float): Width parameter for broadening function. Determines the
-            full-width at half-maximum (FWHM) of the broadening function.
+        data (np.array): 1D array of data points to broaden. Several data
+            series on the same x-axis mesh can be broadened together by
+            passing a 2D array of shape (n_channels, n_points); each row is
+            broadened independently.
+        dist (str): Type of distribution used for broadening: "lorentzian",
+            "gaussian" or "voigt". A Voigt broadening is equivalent to
+            applying Lorentzian and then Gaussian broadening, but is
+            performed with a single combined kernel in one convolution.
+        width (float, array or function): Width parameter for broadening
+            function. Determines the full-width at half-maximum (FWHM) of the
+            broadening function. For "voigt", provide a pair of FWHM values
+            ``(lorentzian, gaussian)``. Energy-dependent broadening is
+            specified with an array of widths corresponding to the data
+            points, or a function which returns widths for an array of
+            x-values; in this case each data point is broadened with its own
+            width. (See :func:`_broaden_variable` for details.)
         pad (float): Distance sampled on each side of broadening function.
+            For "voigt" this applies to each component; by default each
+            component is sampled over 20 times its own (maximum) width.
         d (float): x-axis distance associated with each sample in 1D data
+        method (str): Convolution algorithm. "direct" sums the products of
+            data and kernel (:func:`numpy.convolve`); this is O(N K) for N
+            data points and K kernel points. "fft" multiplies the Fourier
+            transforms of the zero-padded data and kernel, which is
+            O((N + K) log(N + K)) and much faster for long kernels. "auto"
+            selects the faster method with
+            :func:`scipy.signal.choose_conv_method`. Both methods return the
+            same slice of the convolution with the same zero-padded edges;
+            results agree to within floating-point rounding, i.e. differences
+            are below 1e-10 of the largest broadened value.
+            "analytic" multiplies the Fourier transform of the zero-padded
+            data by the closed-form Fourier transform of the broadening
+            function, so no kernel is sampled. The data is padded with
+            zeros on one side by pad, but by no more than the length of the
+            data, so the cost is at most that of a transform over twice the
+            data length whatever the width. The broadening function is
+            effectively periodic on the padded mesh, so its tails wrap
+            around rather than being truncated and the total intensity is
+            conserved; where the padding is capped, tails longer than the
+            data range wrap around onto the opposite end of the data.
+        x_values (np.array): x-values corresponding to data points. Only
+            required if width is a function.
+        tolerance (float): If pad is not given, truncate the broadening
+            function at the smallest distance for which the fraction of its
+            area that is discarded is below this value. For a Gaussian this
+            is much shorter than the default pad; a Lorentzian has long tails
+            and loses about 3% of its area at the default pad. For "voigt"
+            the tolerance is divided between the two components.
+        dtype (str or np.dtype): Floating-point precision of the calculation
+            and result, e.g. "float32". By default this follows the data:
+            single-precision data is broadened in single precision and
+            anything else in double precision.
+        out (np.array): Optional array of the same shape as data in which
+            to place the result. This may be data itself, in which case the
+            data is broadened in-place.
+
+    Note that a "voigt" broadening is not truncated at the data limits
+    between the Lorentzian and Gaussian steps, so within a few Gaussian
+    widths of the ends of the data range it can differ slightly from two
+    successive broadenings. With energy-dependent widths, the Lorentzian and
+    Gaussian broadenings are applied in turn.
 
     """
+    dtype = _float_dtype(data, dtype)
+    data = np.asarray(data, dtype=dtype)
+    n_points = data.shape[-1]
+
+    if dist.lower() == 'voigt':
+        lorentz_width, gauss_width = (
+            _evaluate_width(component, x_values, n_points)
+            for component in width)
+
+        if np.ndim(lorentz_width) or np.ndim(gauss_width):
+            component_tolerance = tolerance / 2 if tolerance else None
+            lorentz_broadened = broaden(data, dist='lorentzian',
+                                        width=lorentz_width, pad=pad, d=d,
+                                        method=method,
+                                        tolerance=component_tolerance,
+                                        out=out)
+            return broaden(lorentz_broadened, dist='gaussian',
+                           width=gauss_width, pad=pad, d=d, method=method,
+                           tolerance=component_tolerance, out=out)
+
+        width = (lorentz_width, gauss_width)
 
-    if not pad:
-        pad = width * 20
+    else:
+        width = _evaluate_width(width, x_values, n_points)
+        if np.ndim(width):
+            return _store(_broaden_variable(data, dist=dist, widths=width,
+                                            pad=pad, d=d, method=method,
+                                            tolerance=tolerance), out)
+
+    pad = _kernel_pad(dist, width, pad=pad, d=d, tolerance=tolerance)
+    if method == 'analytic':
+        return _store(_broaden_analytic(data, dist, width, pad=pad, d=d),
+                      out)
+
+    kernel_key = (dist.lower(), width, pad, d, dtype.name)
+    try:
+        broadening, pad_points = _cached_kernel(*kernel_key)
+    except TypeError:
+        # Unhashable parameters; skip the cache
+        broadening, pad_points = _broadening_kernel(dist, width, pad, d)
+        broadening = broadening.astype(dtype, copy=False)
+        kernel_key = None
+
+    broadened_data = _convolve(broadening, data, method=method,
+                               kernel_key=kernel_key)
+    broadened_data = broadened_data[..., pad_points:n_points + pad_points]
+
+    return _store(broadened_data, out)
+
+
+def _store(result, out=None):
+    """Copy result into out if provided, otherwise return result"""
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+def _float_dtype(data, dtype=None):
+    """Get floating-point type for broadening: float32 or float64
+
+    If dtype is not given, float32 (or smaller) data gives float32 and
+    anything else float64.
+    """
+    if dtype is None:
+        if np.result_type(np.asarray(data), np.float32) == np.float32:
+            dtype = np.float32
+        else:
+            dtype = np.float64
+    return np.dtype(dtype)
+
+
+def _evaluate_width(width, x_values, n_points):
+    """Get broadening width as a scalar or an array matching the data"""
+    if callable(width):
+        if x_values is None:
+            raise ValueError('x_values are required to evaluate width '
+                             'function')
+        width = np.asarray(width(np.asarray(x_values)), dtype=float)
+        # Constant functions may return a scalar
+        width = np.broadcast_to(width, (n_points,))
+
+    if np.ndim(width) and np.shape(width) != (n_points,):
+        raise ValueError('Array of broadening widths does not match data: '
+                         '{0} widths for {1} points.'.format(np.size(width),
+                                                              n_points))
+    return width
+
+
+def _is_fixed_width(width):
+    """Check that width (or Voigt widths) are not energy-dependent"""
+    if isinstance(width, tuple):
+        return all(_is_fixed_width(component) for component in width)
+    else:
+        return not (callable(width) or np.ndim(width))
+
+
+# Ratio between neighbouring widths used to approximate a variable width
+WIDTH_LEVEL_RATIO = 1.05
+
+
+def _broaden_variable(data, dist, widths, pad=False, d=1, method='auto',
+                      tolerance=None):
+    """Broaden data with a different kernel width at each data point
+
+    Each data point is broadened by a kernel with its own width, i.e.
+    ``out[i] = sum_j data[j] kernel(x[i] - x[j], widths[j])``. Rather than
+    evaluating this sum directly, the widths are divided onto a geometric
+    series of levels with ratio ``WIDTH_LEVEL_RATIO``. Each data point is
+    split between the neighbouring levels, linearly in log(width), and each
+    level is then broadened with a fixed-width kernel. With the FFT method
+    the transformed levels are accumulated before a single inverse
+    transform.
+
+    Widths smaller than the sampling interval d are raised to d. Kernels
+    are normalised as in :func:`broaden` (i.e. Gaussians have unit height),
+    so an array of equal widths gives the same result as a single width.
+
+    Args:
+        data (np.array): 1D or 2D array of data, as for :func:`broaden`
+        dist (str): "lorentzian" or "gaussian"
+        widths (np.array): FWHM corresponding to each data point
+        pad (float): Distance sampled on each side of broadening function.
+            Default is determined by the largest width, as for
+            :func:`broaden`.
+        d (float): x-axis distance associated with each sample in 1D data
+        method (str): "direct", "fft" or "auto"
+        tolerance (float): Truncation tolerance, as for :func:`broaden`
+
+    Returns:
+        np.array: Broadened data
+    """
+    data = np.asarray(data)
+    dtype = _float_dtype(data)
+    widths = np.maximum(np.asarray(widths, dtype=float), d)
+    pad = _kernel_pad(dist, widths.max(), pad=pad, d=d, tolerance=tolerance)
+
+    # Every level is sampled at the same whole-sample offsets, so that the
+    # kernels share their origin
+    if dist.lower() in ('lorentz', 'lorentzian'):
+        line_shape = lorentzian
+    elif dist.lower() in ('gauss', 'gaussian'):
+        line_shape = gaussian
+    else:
+        raise Exception('Broadening distribution '
+                        ' "{0}" not known.'.format(dist))
+    pad_points = int(round(pad / d))
+    offsets = np.arange(-pad_points, pad_points) * d
+
+    log_widths = np.log(widths)
+    n_levels = 1 + int(np.ceil((log_widths.max() - log_widths.min())
+                               / log(WIDTH_LEVEL_RATIO)))
+    if n_levels == 1:
+        levels = np.array([widths.max()])
+        lower, frac = np.zeros(widths.shape, dtype=int), np.zeros(widths.shape)
+    else:
+        log_levels = np.linspace(log_widths.min(), log_widths.max(), n_levels)
+        levels = np.exp(log_levels)
+        position = ((log_widths - log_levels[0])
+                    / (log_levels[1] - log_levels[0]))
+        lower = np.minimum(np.floor(position).astype(int), n_levels - 2)
+        frac = position - lower
+
+    n_points = data.shape[-1]
+
+    if method == 'analytic':
+        n_full = n_points
+        n_fft = next_fast_len(
+            n_points + _analytic_pad_points(pad, d, n_points), real=True)
+    else:
+        broadening = line_shape(offsets, fwhm=levels[-1])
+        n_full = len(broadening) + n_points - 1
+        if method == 'auto':
+            first_row = data.reshape(-1, n_points)[0]
+            method = choose_conv_method(broadening, first_row, mode='full')
+        if method == 'fft':
+            n_fft = next_fast_len(n_full, real=True)
+
+    broadened_data = None
+    for i, level in enumerate(levels):
+        weights = (np.where(lower == i, 1 - frac, 0.)
+                   + np.where(lower + 1 == i, frac, 0.)).astype(dtype)
+        if not weights.any():
+            continue
+
+        # Level kernels are not reused by other calls, so they bypass the
+        # kernel caches rather than evicting fixed-width entries
+        if method == 'analytic':
+            level_data = rfft(data * weights, n_fft, axis=-1)
+            level_data *= _transfer_function(dist, level, n_fft,
+                                             d).astype(dtype)
+        else:
+            broadening = line_shape(offsets, fwhm=level).astype(dtype)
+            if method == 'fft':
+                level_data = rfft(data * weights, n_fft, axis=-1)
+                level_data *= rfft(broadening, n_fft)
+            else:
+                level_data = _convolve(broadening, data * weights,
+                                       method=method)
+
+        # Accumulate in-place rather than allocating a new sum per level
+        if broadened_data is None:
+            broadened_data = level_data
+        else:
+            broadened_data += level_data
+
+    if method in ('fft', 'analytic'):
+        broadened_data = irfft(broadened_data, n_fft, axis=-1,
+                               overwrite_x=True)[..., :n_full]
+
+    if method == 'analytic':
+        return broadened_data
+    else:
+        return broadened_data[..., pad_points:n_points + pad_points]
+
+
+def _broaden_analytic(data, dist, width, pad, d):
+    """Broaden data using the analytic Fourier transform of the line shape
+
+    See the "analytic" method of :func:`broaden`. The data are zero-padded
+    on one side before transforming; see :func:`_analytic_pad_points`.
+    """
+    data = np.asarray(data)
+    n_points = data.shape[-1]
+    n_fft = next_fast_len(
+        n_points + _analytic_pad_points(pad, d, n_points), real=True)
+
+    transfer = _kernel_transfer_function(dist.lower(), width, n_fft, d,
+                                         data.dtype.name)
+    data_fft = rfft(data, n_fft, axis=-1)
+    data_fft *= transfer
+    broadened_data = irfft(data_fft, n_fft, axis=-1, overwrite_x=True)
+    return broadened_data[..., :n_points]
+
+
+def _analytic_pad_points(pad, d, n_points):
+    """Number of zeros padding data for analytic broadening
+
+    This is pad (for "voigt", the sum of the component pads) in samples,
+    limited to n_points so that the transform length does not grow with the
+    broadening width.
+    """
+    pad_points = sum(int(component / d) for component in np.atleast_1d(pad))
+    return min(pad_points, n_points)
+
+
+def _transfer_function(dist, width, n_fft, d):
+    """Fourier transform of broadening function at rFFT frequencies
+
+    The normalisation is consistent with the discrete kernels sampled with
+    spacing d by :func:`broaden`, i.e. it includes a factor 1/d.
+
+    Args:
+        dist (str): "lorentzian", "gaussian" or "voigt"
+        width (float or 2-tuple): FWHM; for "voigt" (lorentzian, gaussian)
+        n_fft (int): Length of real transform
+        d (float): Sample spacing
+
+    Returns:
+        np.array: Transfer function at ``scipy.fft.rfftfreq(n_fft, d)``
+    """
+    freq = rfftfreq(n_fft, d)
+
+    if dist.lower() == 'voigt':
+        lorentz_width, gauss_width = width
+        return (_transfer_function('lorentzian', lorentz_width, n_fft, d)
+                * _transfer_function('gaussian', gauss_width, n_fft, d))
+    elif dist.lower() in ('lorentz', 'lorentzian'):
+        return np.exp(-pi * width * freq) / d
+    elif dist.lower() in ('gauss', 'gaussian'):
+        c = width / (2 * sqrt(2 * log(2)))
+        return c * sqrt(2 * pi) * np.exp(-2 * (pi * c * freq)**2) / d
+    else:
+        raise Exception('Broadening distribution '
+                        ' "{0}" not known.'.format(dist))
+
+
+def polynomial_width(width=0, coeffs=()):
+    """Get a function for a broadening width which varies with energy
+
+    The width is a polynomial in the magnitude of the energy (relative to the
+    zero of the energy scale, e.g. the valence-band maximum)::
+
+        w(E) = width + coeffs[0] |E| + coeffs[1] |E|^2 + ...
+
+    Args:
+        width (float): Width at zero energy
+        coeffs (iterable): Coefficients of increasing powers of ``|E|``
+
+    Returns:
+        function: Width as a function of an array of energies, suitable for
+        the width argument of :func:`broaden`
+    """
+    coeffs = tuple(coeffs)
+
+    def width_function(energies):
+        abs_energies = np.abs(energies)
+        return width + sum(coeff * abs_energies**(i + 1)
+                           for i, coeff in enumerate(coeffs))
+
+    return width_function
+
+
+def broaden_sweep(data, d=1, gaussians=None, lorentzians=None, pad=False,
+                  tolerance=None, method='fft', dtype=None):
+    """Broaden one data series with a series of different widths
+
+    The data are Fourier-transformed once; each set of widths then costs
+    one multiplication and one inverse transform. This is useful for
+    tuning the broadening against experimental data.
+
+    Args:
+        data (np.array): 1D array of data points to broaden
+        d (float): x-axis distance associated with each sample in 1D data
+        gaussians (float or iterable): Gaussian FWHM for each spectrum
+        lorentzians (float or iterable): Lorentzian FWHM for each spectrum.
+            Widths are paired with gaussians; a single value (or None, i.e.
+            no broadening) is used with every width of the other type.
+            Where both widths are non-zero, a Voigt function is used.
+        pad (float): Distance sampled on each side of broadening function;
+            see :func:`broaden`
+        tolerance (float): Truncation tolerance; see :func:`broaden`
+        method (str): "fft" (or "auto") uses sampled kernels and gives the
+            same results as :func:`broaden`; "analytic" uses the analytic
+            Fourier transforms of the broadening functions. "direct"
+            convolves the data with each sampled kernel in turn, without a
+            shared transform.
+        dtype (str or np.dtype): Floating-point precision; see
+            :func:`broaden`
+
+    Returns:
+        np.ndarray: (n_widths, n_points) array of broadened data
+    """
+    data = np.asarray(data, dtype=_float_dtype(data, dtype))
+    n_points = len(data)
+    widths = _sweep_widths(gaussians=gaussians, lorentzians=lorentzians)
+
+    params = [_broadening_params(gaussian=gaussian, lorentzian=lorentzian)
+              for lorentzian, gaussian in widths]
+    pads = [None if param is None else
+            _kernel_pad(*param, pad=pad, d=d, tolerance=tolerance)
+            for param in params]
+    pad_points = [0 if param_pad is None else
+                  sum(int(p / d) for p in np.atleast_1d(param_pad))
+                  for param_pad in pads]
+
+    if method == 'analytic':
+        n_fft = next_fast_len(
+            n_points + max((_analytic_pad_points(param_pad, d, n_points)
+                            for param_pad in pads if param_pad is not None),
+                           default=0),
+            real=True)
+    elif method in ('fft', 'auto'):
+        n_fft = next_fast_len(n_points + 2 * max(pad_points), real=True)
+    elif method == 'direct':
+        return np.array([data if param is None else
+                         broaden(data, dist=param[0], width=param[1],
+                                 pad=param_pad, d=d, method='direct')
+                         for param, param_pad in zip(params, pads)],
+                        dtype=data.dtype)
+    else:
+        raise ValueError('Sweep method "{0}" not known. Use "fft", '
+                         '"direct", "analytic" or "auto".'.format(method))
+
+    data_fft = rfft(data, n_fft)
+    broadened_data = np.empty((len(widths), n_points), dtype=data.dtype)
+
+    for i, (param, param_pad, offset) in enumerate(zip(params, pads,
+                                                       pad_points)):
+        if param is None:
+            broadened_data[i] = data
+            continue
+
+        dist, width = param
+        if dist == 'voigt':
+            width = tuple(width)
+
+        if method == 'analytic':
+            transfer = _kernel_transfer_function(dist, width, n_fft, d,
+                                                 data.dtype.name)
+            offset = 0
+        else:
+            transfer = _kernel_fft(
+                (dist, width, param_pad, d, data.dtype.name), n_fft)
+
+        broadened_data[i] = irfft(transfer * data_fft,
+                                  n_fft)[offset:offset + n_points]
+
+    return broadened_data
+
+
+def broaden_lines(xy, x_values, dist='lorentz', width=2, pad=False,
+                  tolerance=None, dtype=np.float64):
+    """Sum broadening functions centred on a set of discrete lines
+
+    This is equivalent to resampling the lines as spikes with
+    :func:`xy_to_1d` and applying :func:`broaden`, but the line shapes are
+    evaluated directly at x_values. When there are few lines compared to the
+    number of x-values (e.g. Raman or IR spectra) this avoids convolving a
+    mesh which is mostly zeros, and the line positions are exact rather than
+    rounded to the mesh. As with spike resampling, lines which do not fall
+    within the mesh are discarded.
+
+    Args:
+        xy: (ndarray) 2D numpy array of line positions and intensities
+        x_values: (iterable) An evenly-spaced x-value mesh
+        dist (str): Type of distribution used for broadening: "lorentzian",
+            "gaussian" or "voigt"
+        width (float or 2-tuple): Full-width at half-maximum of broadening
+            function. For "voigt", provide ``(lorentzian, gaussian)``.
+        pad (float): Distance from each line beyond which the line shape is
+            neglected. Default is the same as for :func:`broaden`.
+        tolerance (float): Truncation tolerance, as for :func:`broaden`
+        dtype (str or np.dtype): Floating-point type of result. The line
+            shapes are always evaluated in double precision.
+
+    Returns:
+        (np.array): Broadened spectrum corresponding to x_values
+    """
+    x_values = np.array(x_values, dtype=float)
+    n_x_values = x_values.size
+    d = x_values[1] - x_values[0]
+
+    x_field, y_field = _xy_fields(xy)
+    positions = np.asarray(xy[x_field], dtype=float)
+    intensities = np.asarray(xy[y_field], dtype=float)
+
+    # Keep the same lines as spike resampling
+    locations = x_values.searchsorted(positions - (0.5 * d))
+    in_range = (locations > 0) & (locations < n_x_values)
+    positions, intensities = positions[in_range], intensities[in_range]
+
+    cutoff, lineshape = _line_cutoff(dist, width, pad, d=d,
+                                     tolerance=tolerance)
+    offsets = np.arange(-int(cutoff / d) - 1, int(cutoff / d) + 2)
+    centres = np.rint((positions - x_values[0]) / d).astype(int)
+
+    # Evaluate line shapes in chunks to limit memory use
+    broadened_data = np.zeros(n_x_values)
+    chunk_size = max(1, 2**20 // len(offsets))
+    for start in range(0, len(positions), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        indices = centres[chunk, np.newaxis] + offsets
+        valid = (indices >= 0) & (indices < n_x_values)
+        dx = (x_values[np.clip(indices, 0, n_x_values - 1)]
+              - positions[chunk, np.newaxis])
+        valid &= np.abs(dx) < cutoff
+
+        weights = np.broadcast_to(intensities[chunk, np.newaxis],
+                                  dx.shape)[valid] * lineshape(dx[valid])
+        broadened_data += np.bincount(indices[valid], weights=weights,
+                                      minlength=n_x_values)
+
+    return broadened_data.astype(dtype, copy=False)
+
+
+def _line_cutoff(dist, width, pad=False, d=1, tolerance=None):
+    """Get cutoff distance and line shape function for broaden_lines
+
+    The line shape is scaled consistently with :func:`broaden` on a mesh
+    with spacing d.
+
+    Returns:
+        2-tuple (float, function)
+    """
+    if dist.lower() == 'voigt':
+        lorentz_width, gauss_width = width
+        cutoff = sum(_kernel_pad(dist, width, pad=pad, d=d,
+                                 tolerance=tolerance))
+
+        def lineshape(f):
+            # Discrete convolution of two kernels carries a factor 1/d
+            return voigt(f, fwhm_l=lorentz_width, fwhm_g=gauss_width) / d
+
+    elif dist.lower() in ('lorentz', 'lorentzian'):
+        cutoff = _kernel_pad(dist, width, pad=pad, d=d, tolerance=tolerance)
+
+        def lineshape(f):
+            return lorentzian(f, fwhm=width)
+
+    elif dist.lower() in ('gauss', 'gaussian'):
+        cutoff = _kernel_pad(dist, width, pad=pad, d=d, tolerance=tolerance)
+
+        def lineshape(f):
+            return gaussian(f, fwhm=width)
+
+    else:
+        raise Exception('Broadening distribution '
+                        ' "{0}" not known.'.format(dist))
+
+    return cutoff, lineshape
+
+
+def _kernel_pad(dist, width, pad=False, d=1, tolerance=None):
+    """Get distance sampled on each side of a broadening function
+
+    If pad is not given, this is the smallest whole number of samples for
+    which the fraction of the function's area lying outside [-pad, pad] is
+    below tolerance; without a tolerance, 20 times the width is used.
+
+    Returns:
+        float: pad distance. For "voigt", a pair of distances for the
+        Lorentzian and Gaussian components; the tolerance is divided between
+        them.
+    """
+    if dist.lower() == 'voigt':
+        if isinstance(pad, tuple):
+            return pad
+        lorentz_width, gauss_width = width
+        component_tolerance = tolerance / 2 if tolerance else None
+        return (_kernel_pad('lorentzian', lorentz_width, pad=pad, d=d,
+                            tolerance=component_tolerance),
+                _kernel_pad('gaussian', gauss_width, pad=pad, d=d,
+                            tolerance=component_tolerance))
+
+    if pad:
+        return pad
+    elif not tolerance:
+        return width * 20
+    elif not 0 < tolerance < 1:
+        raise ValueError('Broadening tolerance must be between 0 and 1.')
+
+    if dist.lower() in ('lorentz', 'lorentzian'):
+        distance = 0.5 * width / tan(0.5 * pi * tolerance)
+    elif dist.lower() in ('gauss', 'gaussian'):
+        c = width / (2 * sqrt(2 * log(2)))
+        distance = sqrt(2) * c * erfcinv(tolerance)
+    else:
+        raise Exception('Broadening distribution '
+                        ' "{0}" not known.'.format(dist))
+
+    # Round up to whole samples; the small margin ensures that the kernel
+    # mesh includes zero and that int(pad / d) is not rounded down.
+    return (ceil(distance / d) + 1e-6) * d
+
+
+def _broadening_kernel(dist, width, pad, d):
+    """Sample a broadening function over the range [-pad, pad)
+
+    Returns:
+        2-tuple (np.array, int):
+            Kernel values and the index of the kernel origin, i.e. the offset
+            of the broadened data in the full convolution.
+    """
+    if dist.lower() == 'voigt':
+        lorentz_width, gauss_width = width
+        lorentz_pad, gauss_pad = _kernel_pad(dist, width, pad=pad, d=d)
+        lorentz_kernel, lorentz_pad = _cached_kernel(
+            'lorentzian', lorentz_width, lorentz_pad, d)
+        gauss_kernel, gauss_pad = _cached_kernel(
+            'gaussian', gauss_width, gauss_pad, d)
+        return (_convolve(lorentz_kernel, gauss_kernel),
+                lorentz_pad + gauss_pad)
+
+    pad = _kernel_pad(dist, width, pad=pad, d=d)
 
     if dist.lower() in ('lorentz', 'lorentzian'):
         fwhm = width
@@ -359,11 +1405,142 @@ def broaden(data, dist='lorentz', width=2, pad=False, d=1):
         raise Exception('Broadening distribution '
                         ' "{0}" not known.'.format(dist))
 
-    pad_points = int(pad / d)
-    broadened_data = np.convolve(broadening, data)
-    broadened_data = broadened_data[pad_points:len(data) + pad_points]
+    return broadening, int(pad / d)
 
-    return broadened_data
+
+# Maximum number of entries held in each of the kernel caches
+KERNEL_CACHE_SIZE = 32
+
+# Largest Fourier transform (in bytes) held in the kernel caches; larger
+# transforms are recomputed for each use
+KERNEL_CACHE_MAX_BYTES = 2**21
+
+# Number of transforms computed without caching, by cache
+_uncached_counts = {'fft': 0, 'transfer': 0}
+
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def _cached_kernel(dist, width, pad, d, dtype='float64'):
+    """Memoized :func:`_broadening_kernel`; returned array is read-only"""
+    broadening, pad_points = _broadening_kernel(dist, width, pad, d)
+    broadening = broadening.astype(dtype, copy=False)
+    broadening.setflags(write=False)
+    return broadening, pad_points
+
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def _cached_kernel_fft(kernel_key, n_fft):
+    """Memoized real FFT of a cached kernel; returned array is read-only"""
+    broadening, _ = _cached_kernel(*kernel_key)
+    kernel_fft = rfft(broadening, n_fft)
+    kernel_fft.setflags(write=False)
+    return kernel_fft
+
+
+@lru_cache(maxsize=KERNEL_CACHE_SIZE)
+def _cached_transfer_function(dist, width, n_fft, d, dtype='float64'):
+    """Memoized :func:`_transfer_function`; returned array is read-only"""
+    transfer = _transfer_function(dist, width, n_fft, d).astype(dtype)
+    transfer.setflags(write=False)
+    return transfer
+
+
+def _transform_nbytes(n_fft, dtype):
+    """Size in bytes of the real FFT of length n_fft of dtype data"""
+    return (n_fft // 2 + 1) * 2 * np.dtype(dtype).itemsize
+
+
+def _kernel_fft(kernel_key, n_fft):
+    """Real FFT of a sampled kernel, cached unless it is too large"""
+    if _transform_nbytes(n_fft, kernel_key[-1]) > KERNEL_CACHE_MAX_BYTES:
+        _uncached_counts['fft'] += 1
+        broadening, _ = _cached_kernel(*kernel_key)
+        return rfft(broadening, n_fft)
+    return _cached_kernel_fft(kernel_key, n_fft)
+
+
+def _kernel_transfer_function(dist, width, n_fft, d, dtype='float64'):
+    """Analytic transfer function, cached unless it is too large"""
+    if _transform_nbytes(n_fft, dtype) > KERNEL_CACHE_MAX_BYTES:
+        _uncached_counts['transfer'] += 1
+        return _transfer_function(dist, width, n_fft, d).astype(dtype)
+    return _cached_transfer_function(dist, width, n_fft, d, dtype)
+
+
+def kernel_cache_info():
+    """Get hit/miss statistics for the broadening kernel caches
+
+    Sampled kernels are cached on (dist, width, pad, d, dtype) and their
+    Fourier transforms additionally on the transform length. Analytic
+    transfer functions are cached on (dist, width, transform length, d,
+    dtype). Each cache
+    holds up to ``KERNEL_CACHE_SIZE`` entries, discarding the
+    least-recently-used. Transforms larger than ``KERNEL_CACHE_MAX_BYTES``
+    are not cached, so the transform caches hold at most
+    ``KERNEL_CACHE_SIZE * KERNEL_CACHE_MAX_BYTES`` bytes each.
+
+    Returns:
+        dict: :func:`functools.lru_cache` statistics (hits, misses, maxsize,
+        currsize) for keys "kernel", "fft" and "transfer", and under
+        "uncached" the number of transforms computed without the "fft" and
+        "transfer" caches because of their size
+    """
+    return {'kernel': _cached_kernel.cache_info(),
+            'fft': _cached_kernel_fft.cache_info(),
+            'transfer': _cached_transfer_function.cache_info(),
+            'uncached': dict(_uncached_counts)}
+
+
+def clear_kernel_cache():
+    """Empty the broadening kernel caches and reset their statistics"""
+    _cached_kernel.cache_clear()
+    _cached_kernel_fft.cache_clear()
+    _cached_transfer_function.cache_clear()
+    for key in _uncached_counts:
+        _uncached_counts[key] = 0
+
+
+def _convolve(kernel, data, method='auto', kernel_key=None):
+    """Full discrete linear convolution of kernel and data
+
+    Args:
+        kernel (np.array): 1D broadening kernel
+        data (np.array): 1D data series, or 2D array of data series in rows.
+            Each row is convolved with the kernel.
+        method (str): "direct", "fft" or "auto"; see :func:`broaden`.
+        kernel_key (tuple or None): Parameters (dist, width, pad, d, dtype)
+            from which kernel was generated. If provided, the Fourier
+            transform of the kernel is taken from the cache.
+
+    Returns:
+        np.array: Convolution with last dimension of length
+        ``len(kernel) + data.shape[-1] - 1``
+    """
+    data = np.asarray(data)
+
+    if method == 'auto':
+        first_row = data.reshape(-1, data.shape[-1])[0]
+        method = choose_conv_method(kernel, first_row, mode='full')
+
+    if method == 'direct':
+        if data.ndim == 1:
+            return np.convolve(kernel, data)
+        else:
+            return convolve(data, kernel[np.newaxis, :], method='direct')
+    elif method == 'fft':
+        n_full = len(kernel) + data.shape[-1] - 1
+        n_fft = next_fast_len(n_full, real=True)
+        if kernel_key is None:
+            kernel_fft = rfft(kernel, n_fft)
+        else:
+            kernel_fft = _kernel_fft(kernel_key, n_fft)
+        data_fft = rfft(data, n_fft, axis=-1)
+        data_fft *= kernel_fft
+        return irfft(data_fft, n_fft, axis=-1,
+                     overwrite_x=True)[..., :n_full]
+    else:
+        raise ValueError('Convolution method "{0}" not known. Use "direct", '
+                         '"fft", "analytic" or "auto".'.format(method))
 
 
 def apply_orbital_weights(pdos_data, cross_sections):
@@ -0,0 +1,185 @@
+"""On-disk cache of data read from input files
+
+Parsing large calculation outputs (e.g. vasprun.xml) can take much longer
+than processing the data, so the arrays returned by the
+:mod:`galore.formats` readers may be stored as compressed .npz files in a
+cache directory. Entries are keyed by the reader, its arguments and the
+input file (identified by path, size and modification time, or optionally
+by a hash of its contents). When the total size of the cache exceeds a
+limit, the least-recently-used entries are removed.
+
+"""
+
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Increment to invalidate cached data when reader output changes
+CACHE_VERSION = 1
+
+# Default limit on total size of cache files, in bytes
+DEFAULT_CACHE_SIZE = 1024**3
+
+_CACHE_SUFFIX = '.npz'
+
+
+def cached_read(reader, filename, cache_dir=None,
+                max_size=DEFAULT_CACHE_SIZE, hash_content=False,
+                related_files=(), **kwargs):
+    """Call a file reader, using cached data if available
+
+    Args:
+        reader (function): Function which reads filename, e.g.
+            :func:`galore.formats.read_vasprun_pdos`. It should return a
+            numpy array or a (nested) dict of arrays.
+        filename (str): Input file
+        cache_dir (str or None): Cache directory, which is created if
+            necessary. If None, the reader is called directly.
+        max_size (int): Limit on total size of cache files in bytes
+        hash_content (bool): Identify input files by a hash of their
+            contents, rather than by path, size and modification time
+        related_files (iterable): Other files read by the reader (e.g. a
+            POSCAR with a DOSCAR) which should also be checked for changes
+        **kwargs: Additional arguments to reader
+
+    Returns:
+        Data from reader
+    """
+    if cache_dir is None:
+        return reader(filename, **kwargs)
+
+    key = cache_key(reader, filename, hash_content=hash_content,
+                    related_files=related_files, **kwargs)
+    path = os.path.join(cache_dir, key + _CACHE_SUFFIX)
+
+    if os.path.isfile(path):
+        try:
+            data = _load(path)
+        except (OSError, ValueError, KeyError):
+            # Incomplete or corrupt entry; read the file again
+            pass
+        else:
+            # Modification time of entry records its last use
+            os.utime(path)
+            return data
+
+    data = reader(filename, **kwargs)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    _save(data, path)
+    evict(cache_dir, max_size=max_size)
+
+    return data
+
+
+def cache_key(reader, filename, hash_content=False, related_files=(),
+              **kwargs):
+    """Get cache key for data from a reader and input file
+
+    Returns:
+        str: hexadecimal digest
+    """
+    key = hashlib.sha256()
+    key.update('{0}:{1}.{2}:{3!r}'.format(
+        CACHE_VERSION, reader.__module__, reader.__qualname__,
+        sorted(kwargs.items())).encode())
+
+    for input_file in (filename,) + tuple(related_files):
+        if not os.path.isfile(input_file):
+            key.update(b'missing')
+        elif hash_content:
+            with open(input_file, 'rb') as f:
+                for chunk in iter(lambda: f.read(2**20), b''):
+                    key.update(chunk)
+        else:
+            stat = os.stat(input_file)
+            key.update('{0}:{1}:{2}'.format(os.path.abspath(input_file),
+                                            stat.st_size,
+                                            stat.st_mtime_ns).encode())
+    return key.hexdigest()
+
+
+def evict(cache_dir, max_size=DEFAULT_CACHE_SIZE):
+    """Remove least-recently-used cache entries until below size limit
+
+    Args:
+        cache_dir (str): Cache directory
+        max_size (int): Limit on total size of cache files in bytes
+    """
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith(_CACHE_SUFFIX):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total_size <= max_size:
+            break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            # Removed by another process
+            pass
+        total_size -= size
+
+
+def clear_cache(cache_dir):
+    """Remove all entries from cache directory"""
+    evict(cache_dir, max_size=-1)
+
+
+def _save(data, path):
+    """Write array or nested dict of arrays to .npz file
+
+    Nested dicts are flattened to keys joined with "/"; the order of the
+    keys, and any None values, are recorded in the "keys" entry.
+    """
+    if isinstance(data, dict):
+        items = _flatten(data)
+        arrays = {'key_{0}'.format(i): value
+                  for i, (_, value) in enumerate(items)
+                  if value is not None}
+        arrays['keys'] = np.array(['/'.join(key) for key, _ in items])
+        arrays['is_none'] = np.array([value is None for _, value in items])
+    else:
+        arrays = {'data': data}
+
+    # Write to a temporary file so that other processes never see a
+    # partially-written entry
+    cache_dir = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp',
+                                     delete=False) as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(f.name, path)
+
+
+def _load(path):
+    """Read array or nested dict of arrays written by :func:`_save`"""
+    with np.load(path) as arrays:
+        if 'data' in arrays:
+            return arrays['data']
+
+        data = OrderedDict()
+        for i, (key, is_none) in enumerate(zip(arrays['keys'],
+                                               arrays['is_none'])):
+            *parents, name = str(key).split('/')
+            level = data
+            for parent in parents:
+                level = level.setdefault(parent, OrderedDict())
+            level[name] = None if is_none else arrays['key_{0}'.format(i)]
+        return data
+
+
+def _flatten(data, prefix=()):
+    """Get (key path, value) pairs of nested dict in order"""
+    items = []
+    for key, value in data.items():
+        if isinstance(value, dict):
+            items += _flatten(value, prefix + (str(key),))
+        else:
+            items.append((prefix + (str(key),), value))
+    return items
@@ -42,6 +42,17 @@ except ImportError:
 
 
 def main():
+    parser = get_parser()
+    args = parser.parse_args()
+    args = vars(args)
+    if args['sweep'] is not False and args['pdos']:
+        parser.error('--sweep is only available for simple DOS/spectra, '
+                     'not --pdos')
+    if args['sweep'] is not False and (args['gaussian_coeffs']
+                                       or args['lorentzian_coeffs']):
+        parser.error('--sweep does not support energy-dependent widths '
+                     '(--gaussian-coeffs or --lorentzian-coeffs)')
+
     logging.basicConfig(filename='galore.log', level=logging.INFO)
     console = logging.StreamHandler()
     logging.getLogger().addHandler(console)
@@ -49,9 +60,6 @@ def main():
     warnings.filterwarnings("ignore", module="matplotlib")
     warnings.filterwarnings("ignore", module="pymatgen")
 
-    parser = get_parser()
-    args = parser.parse_args()
-    args = vars(args)
     run(**args)
 
 
@@ -67,7 +75,17 @@ def run(**kwargs):
     else:
         kwargs['sampling'] = 1e-2
 
-    if kwargs['pdos']:
+    if kwargs.get('cache_size') is not None:
+        kwargs['cache_size'] = int(kwargs['cache_size'] * 1024**2)
+
+    for dist in ('lorentzian', 'gaussian'):
+        coeffs = kwargs.get(dist + '_coeffs')
+        if coeffs:
+            kwargs[dist] = galore.polynomial_width(kwargs[dist] or 0, coeffs)
+
+    if kwargs.get('sweep') or kwargs.get('sweep', False) is None:
+        sweep_from_files(**kwargs)
+    elif kwargs['pdos']:
         pdos_from_files(**kwargs)
     else:
         simple_dos_from_files(**kwargs)
@@ -130,6 +148,15 @@ def pdos_from_files(return_plt=False, **kwargs):
                                   filetype='txt',
                                   flipx=kwargs['flipx'])
 
+    for filetype in ('npz', 'hdf5'):
+        if kwargs.get(filetype):
+            galore.formats.write_pdos(pdos_plotting_data,
+                                      filename=kwargs[filetype],
+                                      filetype=filetype,
+                                      flipx=kwargs['flipx'],
+                                      metadata=output_metadata(**kwargs),
+                                      compression=kwargs.get('compress'))
+
 
 def simple_dos_from_files(return_plt=False, **kwargs):
     """Generate a spectrum or DOS over one data series
@@ -148,9 +175,11 @@ def simple_dos_from_files(return_plt=False, **kwargs):
 
     if not any(((kwargs['csv'] is None), (kwargs['txt'] is None),
                 (kwargs['plot'] is None),
-                kwargs['csv'], kwargs['txt'], kwargs['plot'])):
+                kwargs['csv'], kwargs['txt'], kwargs['plot'],
+                kwargs.get('npz'), kwargs.get('hdf5'))):
         print("No output selected. Please use at least one of the output "
-              "options (CSV, txt, plotting). For usage information, run "
+              "options (CSV, txt, npz, hdf5, plotting). For usage "
+              "information, run "
               "galore with -h argument.")
 
     if kwargs['plot'] or kwargs['plot'] is None:
@@ -183,6 +212,73 @@ def simple_dos_from_files(return_plt=False, **kwargs):
         galore.formats.write_txt(
             x_values, broadened_data, filename=kwargs['txt'])
 
+    columns = OrderedDict([('x', x_values), ('y', broadened_data)])
+    if kwargs.get('npz'):
+        galore.formats.write_npz(columns, kwargs['npz'],
+                                 metadata=output_metadata(**kwargs),
+                                 compress=kwargs.get('compress'))
+
+    if kwargs.get('hdf5'):
+        galore.formats.write_hdf5(
+            columns, kwargs['hdf5'], metadata=output_metadata(**kwargs),
+            compression=('gzip' if kwargs.get('compress') else None))
+
+
+def output_metadata(**kwargs):
+    """Collect processing parameters to store with binary output
+
+    Args:
+        **kwargs: See command reference for full argument list
+
+    Returns:
+        dict: Input files, units, sampling, broadening and weighting
+        settings. Energy-dependent widths are given by their value at zero
+        energy and the "gaussian_coeffs" or "lorentzian_coeffs" entry.
+    """
+    metadata = OrderedDict()
+    for key in ('input', 'units', 'sampling', 'gaussian', 'lorentzian',
+                'gaussian_coeffs', 'lorentzian_coeffs', 'tolerance',
+                'weighting', 'spikes', 'rebin', 'flipx', 'dtype'):
+        value = kwargs.get(key)
+        if callable(value):
+            value = float(value(0.))
+        metadata[key] = value
+    return metadata
+
+
+def sweep_from_files(**kwargs):
+    """Broaden a spectrum or DOS with a series of widths and write to file
+
+    Widths are taken from kwargs['sweep_gaussian'] and
+    kwargs['sweep_lorentzian']; if either is not set, the single
+    kwargs['gaussian'] or kwargs['lorentzian'] value is used.
+
+    Args:
+        **kwargs: See command reference for full argument list
+
+    """
+    if kwargs['pdos']:
+        raise ValueError("Broadening sweeps are only available for simple "
+                         "DOS/spectra, not --pdos")
+    if any(callable(kwargs.get(dist)) for dist in ('gaussian', 'lorentzian')):
+        raise ValueError("Broadening sweeps do not support energy-dependent "
+                         "widths")
+
+    gaussians = kwargs.get('sweep_gaussian') or kwargs.get('gaussian')
+    lorentzians = kwargs.get('sweep_lorentzian') or kwargs.get('lorentzian')
+
+    x_values, widths, spectra = galore.sweep_1d_data(
+        gaussians=gaussians or None, lorentzians=lorentzians or None,
+        **{key: value for key, value in kwargs.items()
+           if key not in ('gaussian', 'lorentzian')})
+
+    if kwargs['flipx']:
+        x_values = np.flip(-x_values)
+        spectra = np.flip(spectra, axis=-1)
+
+    galore.formats.write_sweep(x_values, widths, spectra,
+                               filename=kwargs['sweep'])
+
 
 def get_parser():
     """Parse command-line arguments. Function is used to build the CLI docs."""
@@ -208,6 +304,40 @@ def get_parser():
         const=2,
         type=float,
         help='Apply Gaussian broadening with specified width.')
+    parser.add_argument(
+        '--lorentzian-coeffs', '--lorentzian_coeffs', type=float, nargs='+',
+        default=None, dest='lorentzian_coeffs', metavar='C',
+        help='Make Lorentzian width energy-dependent: width(E) = l + '
+             'C1 |E| + C2 |E|^2 + ... where l is the --lorentzian value '
+             '(or zero) and E is relative to the zero of the energy scale.')
+    parser.add_argument(
+        '--gaussian-coeffs', '--gaussian_coeffs', type=float, nargs='+',
+        default=None, dest='gaussian_coeffs', metavar='C',
+        help='Make Gaussian width energy-dependent: width(E) = g + '
+             'C1 |E| + C2 |E|^2 + ... where g is the --gaussian value '
+             '(or zero).')
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=None,
+        help='Truncate broadening functions where the fraction of their area '
+             'beyond the cutoff falls below this value (e.g. 1e-4). By '
+             'default functions are truncated at 20 times their width.')
+    parser.add_argument(
+        '--method', '--broadening-method',
+        type=str,
+        default='auto',
+        choices=('auto', 'direct', 'fft', 'analytic'),
+        help='Broadening algorithm: direct or FFT convolution with a sampled '
+             'broadening function, or multiplication by its analytic Fourier '
+             'transform. "auto" selects the faster convolution method.')
+    parser.add_argument(
+        '--float32', '--single-precision',
+        action='store_const', dest='dtype', const='float32',
+        default='float64',
+        help='Resample and broaden data in single precision. This halves '
+             'memory use and is faster for large meshes; relative errors are '
+             'around 1e-6.')
     parser.add_argument(
         '-w', '--weighting',
         type=str,
@@ -247,6 +377,43 @@ def get_parser():
         const=None,
         help='Write broadened output as comma-separated values; file if path '
              'provided, otherwise write to standard output.')
+    parser.add_argument(
+        '--npz',
+        nargs='?',
+        default=False,
+        const='galore_output.npz',
+        help='Write broadened output to a NumPy .npz archive, with an array '
+             'for each column and processing settings as metadata. Default '
+             'filename is galore_output.npz.')
+    parser.add_argument(
+        '--hdf5',
+        nargs='?',
+        default=False,
+        const='galore_output.h5',
+        help='Write broadened output to an HDF5 file, with a dataset for '
+             'each column and processing settings as metadata. Requires '
+             'h5py. Default filename is galore_output.h5.')
+    parser.add_argument(
+        '--compress', action='store_true',
+        help='Compress --npz or --hdf5 output')
+    parser.add_argument(
+        '--sweep',
+        nargs='?',
+        default=False,
+        const=None,
+        help='Broaden with each of the widths given by --sweep-gaussian '
+             'and/or --sweep-lorentzian, reading the input only once. All '
+             'spectra are written to this file (.npz for a NumPy archive, '
+             'otherwise CSV), or as CSV to standard output if no path is '
+             'provided. Other outputs are not produced.')
+    parser.add_argument(
+        '--sweep-gaussian', '--sweep_gaussian', type=float, nargs='+',
+        default=None, dest='sweep_gaussian', metavar='G',
+        help='Gaussian widths for --sweep')
+    parser.add_argument(
+        '--sweep-lorentzian', '--sweep_lorentzian', type=float, nargs='+',
+        default=None, dest='sweep_lorentzian', metavar='L',
+        help='Lorentzian widths for --sweep, paired with --sweep-gaussian')
     parser.add_argument(
         '-p',
         '--plot',
@@ -273,6 +440,32 @@ def get_parser():
              'distributions such as DOS. If the input data set only contains '
              'active energies/frequencies (e.g. IR modes) then you should use '
              '--spike mode. See tutorials for examples.')
+    parser.add_argument(
+        '--linear-spikes',
+        action='store_const', dest='spikes', const='linear',
+        help='Resample data as spikes, dividing each value between the two '
+             'nearest x-values. Peak positions are preserved more accurately '
+             'than with --spikes, allowing a coarser --sampling.')
+    parser.add_argument(
+        '--rebin', action='store_true',
+        help='Resample distribution data by averaging over each sampling '
+             'interval rather than interpolating. This conserves the '
+             'integrated intensity when --sampling is coarser than the '
+             'input data.')
+    parser.add_argument(
+        '--cache-dir', '--cache_dir', type=str, default=None,
+        dest='cache_dir',
+        help='Directory in which to store data read from input files, so '
+             'that they are only parsed again if they change.')
+    parser.add_argument(
+        '--cache-size', '--cache_size', type=float, default=1024,
+        dest='cache_size', metavar='MB',
+        help='Limit on total size of cache directory in megabytes; '
+             'least-recently-used data is removed first.')
+    parser.add_argument(
+        '--nproc', type=int, default=1,
+        help='Number of processes used to compute orbital-projected DOS '
+             'from GPAW calculations.')
     parser.add_argument(
         '--pdos', action="store_true", help='Use orbital-projected data')
     parser.add_argument(
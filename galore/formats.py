@@ -19,11 +19,19 @@
 ###############################################################################
 import os
 import csv
+import io
+import json
 import re
 import sys
 from collections import OrderedDict
+from itertools import islice
+from math import sqrt
 import numpy as np
 
+# Number of values formatted at once by the text and CSV writers; output is
+# built in slabs of roughly this size to limit memory use.
+WRITE_CHUNK_SIZE = 2**16
+
 
 def is_gpw(filename):
     """Determine whether file is GPAW calculation by checking extension"""
@@ -32,37 +40,39 @@ def is_gpw(filename):
 
 def is_doscar(filename):
     """Determine whether file is a DOSCAR by checking fourth line"""
+    return _is_doscar_head(read_head(filename))
 
-    # This doesn't break when the file is 3 lines or less; f.readline() just
-    # starts returning empty strings which also fail the test.
-    with open(filename, 'r') as f:
-        for i in range(3):
-            f.readline()
-        if f.readline().strip() == 'CAR':
-            return True
-        else:
-            return False
+
+def _is_doscar_head(lines):
+    """Determine whether first lines of file are from a DOSCAR"""
+    # Files of 3 lines or less simply fail the test
+    return len(lines) > 3 and lines[3].strip() == 'CAR'
 
 
 def is_vasp_raman(filename):
     """Determine if file is raman-sc/vasp_raman.py data by checking header"""
-    with open(filename, 'r') as f:
-        line = f.readline()
+    return _is_vasp_raman_head(read_head(filename))
 
-    return line.strip() == '# mode    freq(cm-1)    alpha    beta2    activity'
+
+def _is_vasp_raman_head(lines):
+    """Determine whether first lines of file are vasp_raman.py output"""
+    return bool(lines) and (
+        lines[0].strip()
+        == '# mode    freq(cm-1)    alpha    beta2    activity')
 
 
 def is_csv(filename):
-    """Determine whether file is CSV by checking extension"""
-    return filename.split('.')[-1] == 'csv'
+    """Determine whether file is CSV by checking extension
+
+    A compression suffix (e.g. ".csv.gz") is ignored."""
+    return _file_extension(filename) == 'csv'
 
 
 def is_xml(filename):
-    """Determine whether file is XML by checking extension"""
-    if filename.split('.')[-1] == 'gz':
-        return filename.split('.')[-2] == 'xml'
-    else:
-        return filename.split('.')[-1] == 'xml'
+    """Determine whether file is XML by checking extension
+
+    A compression suffix (e.g. ".xml.gz") is ignored."""
+    return _file_extension(filename) == 'xml'
 
 
 def is_complete_dos(pdos):
@@ -88,9 +98,19 @@ def write_txt(x_values, y_values, filename="galore_output.txt", header=None):
     _write_txt_rows(rows, filename=filename, header=header)
 
 
+def _row_chunks(data):
+    """Split a 2D array into blocks of rows for formatting"""
+    chunk_rows = max(1, WRITE_CHUNK_SIZE // max(1, data.shape[1]))
+    for start in range(0, len(data), chunk_rows):
+        yield data[start:start + chunk_rows]
+
+
 def _write_txt_rows(rows, filename=None, header=None):
     """Write rows of data to space-separated text output
 
+    Numerical data is formatted in blocks of rows which are written to the
+    output in a single call.
+
     Args:
         rows (iterable): Rows to write. Rows should be a list of values.
         filename (str or None): Filename for text output. If None, write to
@@ -99,28 +119,35 @@ def _write_txt_rows(rows, filename=None, header=None):
             file. Useful if rows is a generator you don't want to mess with.
 
     """
+    if not isinstance(rows, np.ndarray):
+        rows = np.array(list(rows))
 
-    def _format_line(row):
-        return ' '.join(('{0:10.6e}'.format(x) for x in row)) + '\n'
+    def _write_txt(rows, f, header):
+        if header is not None:
+            f.write(header + '\n')
+        if rows.ndim != 2 or rows.size == 0:
+            return
 
-    lines = map(_format_line, rows)
+        # '%10.6e' gives the same result as '{0:10.6e}'.format()
+        line_format = ' '.join(['%10.6e'] * rows.shape[1]) + '\n'
+        for chunk in _row_chunks(rows):
+            f.write((line_format * len(chunk)) % tuple(chunk.ravel()))
 
     if filename is not None:
         with open(filename, 'w') as f:
-            if header is not None:
-                f.write(header + '\n')
-            f.writelines(lines)
+            _write_txt(rows, f, header=header)
 
     else:
-        if header is not None:
-            print(header)
-        for line in lines:
-            print(line, end='')
+        _write_txt(rows, sys.stdout, header=header)
 
 
 def _write_csv_rows(rows, filename=None, header=None):
     """Write rows of data to output in CSV format
 
+    Arrays of integers, floats or strings are formatted in blocks of rows;
+    other data is passed row-by-row to :func:`csv.writer`. Floats are
+    written with the shortest representation at their own precision.
+
     Args:
         rows (iterable): Rows to write. Rows should be a list of values.
         filename (str or None): Filename for CSV output. If None, write to
@@ -134,7 +161,22 @@ def _write_csv_rows(rows, filename=None, header=None):
         writer = csv.writer(f, lineterminator=os.linesep)
         if header is not None:
             writer.writerow(header)
-        writer.writerows(rows)
+
+        if _is_bulk_csv_array(rows):
+            for chunk in _row_chunks(rows):
+                if chunk.dtype.kind in 'iu' or chunk.dtype == np.float64:
+                    # csv.writer formats numbers with str(), which for these
+                    # types matches repr() of the equivalent Python int/float
+                    lines = (','.join(map(repr, row))
+                             for row in chunk.tolist())
+                else:
+                    # Single-precision values are converted to text before
+                    # they can be promoted to Python (double-precision) floats
+                    lines = (','.join(row)
+                             for row in chunk.astype(str).tolist())
+                f.write(''.join(line + os.linesep for line in lines))
+        else:
+            writer.writerows(rows)
 
     if filename is None:
         _write_csv(rows, sys.stdout, header=header)
@@ -144,6 +186,26 @@ def _write_csv_rows(rows, filename=None, header=None):
             _write_csv(rows, f, header=header)
 
 
+def _is_bulk_csv_array(rows):
+    """Check if rows can be formatted as CSV without csv.writer"""
+    return (isinstance(rows, np.ndarray) and rows.ndim == 2
+            and (rows.dtype.kind in 'iuU'
+                 or rows.dtype in (np.float32, np.float64)))
+
+
+def _stack_columns(columns):
+    """Stack 1D columns as a 2D array for CSV output
+
+    Columns of different types are converted to text separately, so that
+    single-precision data is not written with double-precision rounding
+    noise.
+    """
+    columns = [np.asarray(column) for column in columns]
+    if len(set(column.dtype for column in columns)) == 1:
+        return np.column_stack(columns)
+    return np.column_stack([column.astype(str) for column in columns])
+
+
 def write_csv(x_values, y_values, filename="galore_output.csv", header=None):
     """Write output to a simple space-delimited file
 
@@ -157,11 +219,43 @@ def write_csv(x_values, y_values, filename="galore_output.csv", header=None):
 
         """
 
-    rows = zip(x_values, y_values)
+    if isinstance(x_values, np.ndarray) and isinstance(y_values, np.ndarray):
+        rows = _stack_columns((x_values, y_values))
+    else:
+        rows = zip(x_values, y_values)
     _write_csv_rows(rows, filename=filename, header=header)
 
 
-def write_pdos(pdos_data, filename=None, filetype="txt", flipx=False):
+def write_sweep(x_values, widths, spectra, filename="galore_sweep.csv"):
+    """Write spectra broadened with a series of widths to a single file
+
+    Args:
+        x_values (iterable): x-values common to all spectra
+        widths (np.ndarray): (n_widths, 2) array of (lorentzian, gaussian)
+            widths, e.g. from :func:`galore.sweep_1d_data`
+        spectra (np.ndarray): (n_widths, n_points) array of broadened data
+        filename (str): Path to output file. If the extension is ".npz",
+            arrays "x", "lorentzian", "gaussian" and "spectra" are written
+            to a compressed NumPy archive. Otherwise, CSV is written with a
+            column for each set of widths; if None, CSV is written to
+            standard output.
+
+    """
+    widths = np.asarray(widths)
+
+    if filename is not None and filename.split('.')[-1] == 'npz':
+        np.savez_compressed(filename, x=np.asarray(x_values),
+                            lorentzian=widths[:, 0], gaussian=widths[:, 1],
+                            spectra=np.asarray(spectra))
+    else:
+        header = ['x'] + ['l{0:g}_g{1:g}'.format(lorentzian, gaussian)
+                          for lorentzian, gaussian in widths]
+        data = _stack_columns([x_values] + list(np.asarray(spectra)))
+        _write_csv_rows(data, filename=filename, header=header)
+
+
+def write_pdos(pdos_data, filename=None, filetype="txt", flipx=False,
+               metadata=None, compression=False):
     """Write PDOS or XPS data to CSV file
 
     Args:
@@ -173,9 +267,15 @@ def write_pdos(pdos_data, filename=None, filetype="txt", flipx=False):
              where DOS values are 1D numpy arrays. For deterministic output,
              use ordered dictionaries!
         filename (str or None): Filename for output. If None, write to stdout
-        filetype (str): Format for output; "csv" or "txt.
+        filetype (str): Format for output; "csv", "txt", "npz" or "hdf5".
+            Binary formats store columns "energy", "total" and "el/orbital";
+            see :func:`write_npz` and :func:`write_hdf5`. A filename is
+            required for binary formats.
         flipx (bool): Negate the x-axis (i.e. energy) values to make binding
             energies
+        metadata (dict): Information to store with npz or hdf5 output, e.g.
+            broadening widths and units
+        compression (bool): Compress npz or hdf5 output
     """
 
     header = ['energy']
@@ -189,19 +289,174 @@ def write_pdos(pdos_data, filename=None, filetype="txt", flipx=False):
                 header += ['_'.join((el, orbital))]
                 cols.append(values)
 
-    data = np.array(cols).T
-
-    total = data[:, 1:].sum(axis=1)
-    data = np.insert(data, 1, total, axis=1)
+    if filetype in ('npz', 'hdf5'):
+        if filename is None:
+            raise ValueError('A filename is required for {0} '
+                             'output.'.format(filetype))
+        names = ['energy', 'total'] + [
+            '/'.join((el, orbital))
+            for el, orbitals in pdos_data.items()
+            for orbital in orbitals if orbital.lower() != 'energy']
+        total = np.sum(cols[1:], axis=0) if len(cols) > 1 else 0 * cols[0]
+        columns = OrderedDict(zip(names, [cols[0], total] + cols[1:]))
+        if filetype == 'npz':
+            write_npz(columns, filename, metadata=metadata,
+                      compress=compression)
+        else:
+            write_hdf5(columns, filename, metadata=metadata,
+                       compression=('gzip' if compression else None))
+        return
+
+    # Channels keep their own precision, e.g. for single-precision output
+    channels = np.array(cols[1:])
+    total = channels.sum(axis=0) if len(cols) > 1 else 0 * cols[0]
+    columns = [cols[0], total] + list(channels)
     header.insert(1, 'total')
 
     if filetype == 'csv':
-        _write_csv_rows(data, filename=filename, header=header)
+        _write_csv_rows(_stack_columns(columns), filename=filename,
+                        header=header)
     elif filetype == 'txt':
         header = ' ' + ' '.join(('{0:12s}'.format(x) for x in header))
-        _write_txt_rows(data, filename=filename, header=header)
+        _write_txt_rows(np.column_stack(columns), filename=filename,
+                        header=header)
     else:
-        raise ValueError('filetype "{0}" not recognised. Use "txt" or "csv".')
+        raise ValueError('filetype "{0}" not recognised. Use "txt", "csv", '
+                         '"npz" or "hdf5".'.format(filetype))
+
+
+def write_npz(columns, filename, metadata=None, compress=False):
+    """Write columns of data to a NumPy .npz archive
+
+    Each column is stored as a separate array, so that it can be loaded
+    without reading the others (see :func:`read_npz`).
+
+    Args:
+        columns (dict): Column names and 1D arrays, e.g.
+            ``{'energy': x_values, 'total': y_values, 'Zn/s': ...}``
+        filename (str): Path to output file
+        metadata (dict): Information such as broadening widths and units.
+            This is stored as a JSON string in the array "metadata".
+        compress (bool): Use zip compression. Uncompressed arrays are
+            quicker to load.
+    """
+    arrays = OrderedDict((name, np.asarray(values))
+                         for name, values in columns.items())
+    if 'metadata' in arrays:
+        raise ValueError('"metadata" cannot be used as a column name')
+    arrays['metadata'] = np.array(_metadata_json(metadata))
+
+    if compress:
+        np.savez_compressed(filename, **arrays)
+    else:
+        np.savez(filename, **arrays)
+
+
+def read_npz(filename, columns=None):
+    """Read columns of data written by :func:`write_npz`
+
+    Args:
+        filename (str): Path to .npz file
+        columns (iterable or None): Names of columns to read. If None, read
+            all columns.
+
+    Returns:
+        (OrderedDict, dict): Column names and arrays, and metadata
+    """
+    with np.load(filename) as data:
+        if columns is None:
+            columns = [name for name in data.files if name != 'metadata']
+        column_data = OrderedDict((name, data[name]) for name in columns)
+        metadata = (json.loads(str(data['metadata']))
+                    if 'metadata' in data.files else {})
+    return column_data, metadata
+
+
+def write_hdf5(columns, filename, metadata=None, compression=None,
+               chunks=None):
+    """Write columns of data to an HDF5 file
+
+    The h5py package must be present on the system to use this method.
+    Each column is a dataset; names containing "/" (e.g. "Zn/s") are placed
+    in groups. Datasets may be sliced on reading without loading the
+    whole file.
+
+    Args:
+        columns (dict): Column names and 1D arrays, e.g.
+            ``{'energy': x_values, 'total': y_values, 'Zn/s': ...}``
+        filename (str): Path to output file
+        metadata (dict): Information such as broadening widths and units.
+            This is stored as a JSON string in the "metadata" attribute of
+            the root group.
+        compression (str or None): HDF5 compression filter, e.g. "gzip"
+        chunks (int or None): Number of values per chunk. Compressed data is
+            always chunked; if None, h5py chooses a chunk size.
+    """
+    try:
+        import h5py
+    except ImportError as e:
+        e.msg = "h5py package neccessary to write HDF5 files"
+        raise
+
+    with h5py.File(filename, 'w', track_order=True) as f:
+        f.attrs['metadata'] = _metadata_json(metadata)
+        for name, values in columns.items():
+            *parents, _ = name.split('/')
+            group = f
+            for parent in parents:
+                if parent not in group:
+                    group.create_group(parent, track_order=True)
+                group = group[parent]
+
+            values = np.asarray(values)
+            f.create_dataset(
+                name, data=values, compression=compression,
+                chunks=((min(chunks, len(values)),) if chunks and len(values)
+                        else None))
+
+
+def read_hdf5(filename, columns=None):
+    """Read columns of data written by :func:`write_hdf5`
+
+    The h5py package must be present on the system to use this method.
+
+    Args:
+        filename (str): Path to HDF5 file
+        columns (iterable or None): Names of columns to read. If None, read
+            all datasets in the order they were written.
+
+    Returns:
+        (OrderedDict, dict): Column names and arrays, and metadata
+    """
+    try:
+        import h5py
+    except ImportError as e:
+        e.msg = "h5py package neccessary to read HDF5 files"
+        raise
+
+    with h5py.File(filename, 'r') as f:
+        if columns is None:
+            columns = _hdf5_dataset_names(f, h5py.Dataset)
+        column_data = OrderedDict((name, f[name][()]) for name in columns)
+        metadata = json.loads(f.attrs.get('metadata', '{}'))
+    return column_data, metadata
+
+
+def _hdf5_dataset_names(group, dataset_type, prefix=''):
+    """Get paths of datasets in HDF5 group, in creation order if tracked"""
+    names = []
+    for key, item in group.items():
+        if isinstance(item, dataset_type):
+            names.append(prefix + key)
+        else:
+            names += _hdf5_dataset_names(item, dataset_type,
+                                         prefix=prefix + key + '/')
+    return names
+
+
+def _metadata_json(metadata):
+    """Serialise output metadata, falling back to str() for other objects"""
+    return json.dumps({} if metadata is None else metadata, default=str)
 
 
 def read_csv(filename):
@@ -233,7 +488,8 @@ def read_txt(filename, delimiter=None):
         n x 2 Numpy array of frequencies and intensities
 
     """
-    xy_data = np.genfromtxt(filename, comments='#', delimiter=delimiter)
+    with open_file(filename) as f:
+        xy_data = np.genfromtxt(f, comments='#', delimiter=delimiter)
 
     columns = np.shape(xy_data)[1]
 
@@ -268,7 +524,8 @@ def read_pdos_txt(filename, abs_values=True):
         data (np.ndarray): Numpy structured array with named columns
             corresponding to input data format.
     """
-    data = np.genfromtxt(filename, names=True)
+    with open_file(filename) as f:
+        data = np.genfromtxt(f, names=True)
 
     if abs_values:
         for col in data.dtype.names[1:]:
@@ -309,34 +566,187 @@ def read_doscar(filename="DOSCAR"):
         filename (str): Path to DOSCAR file
 
     Returns:
-        data (2-tuple): Tuple containing x values and y values as lists
+        data (np.ndarray): 2D array of energy values and total DOS. For
+            spin-polarised calculations the spin channels are summed.
     """
-    with open(filename, 'r') as f:
-        # Scroll to line 6 which contains NEDOS
-        for i in range(5):
+    with open_file(filename) as f:
+        nedos = int(_read_doscar_header(f)[5].split()[2])
+        tdos = _read_doscar_block(f, nedos)
+
+    # Infer number of spin channels from number of fields
+    spin_channels = (tdos.shape[1] - 1) / 2
+    if spin_channels == 1:
+        return tdos[:, :2]
+    elif spin_channels == 2:
+        return np.column_stack([tdos[:, 0], tdos[:, 1] + tdos[:, 2]])
+    else:
+        raise Exception("Too many columns in DOSCAR")
+
+
+def read_doscar_pdos(filename="DOSCAR", species=None):
+    """Read projected density-of-states (PDOS) data from a VASP DOSCAR file
+
+    The DOSCAR must contain site-projected data (i.e. VASP was run with
+    LORBIT >= 10). Data for each atom is summed by element, and
+    lm-decomposed data (LORBIT=11) is summed for each angular momentum.
+    Spin-up and spin-down channels are summed; for non-collinear
+    calculations only the total (rather than magnetisation) component is
+    used. The spin components are identified from the numbers of columns
+    in the total DOS and PDOS, as the corresponding DOSCAR header field is
+    not always set. Energies are as written by VASP, i.e. not shifted
+    relative to the Fermi level.
+
+    Args:
+        filename (str): Path to DOSCAR file
+        species (list or None): Element symbol of each atom, in order. If
+            None, species are read from a CONTCAR or POSCAR file (VASP 5
+            format) in the same directory as the DOSCAR.
+
+    Returns:
+        pdos_data (OrderedDict): PDOS data formatted as nestled OrderedDict
+            of: {element: {'energy': energies, 's': densities, 'p' ... }
+    """
+    with open_file(filename) as f:
+        header = _read_doscar_header(f)
+        n_ions, _, has_pdos, header_ncdij = (int(x)
+                                             for x in header[0].split()[:4])
+        nedos = int(header[5].split()[2])
+        if not has_pdos:
+            raise ValueError("DOSCAR file {0} does not contain projected DOS "
+                             "data. Set LORBIT >= 10 in VASP "
+                             "calculation.".format(filename))
+
+        if species is None:
+            species = _read_poscar_species(os.path.dirname(filename))
+        species = list(species)
+        if len(species) != n_ions:
+            raise ValueError("Number of species ({0}) does not match number "
+                             "of atoms in DOSCAR ({1})".format(len(species),
+                                                               n_ions))
+
+        # Total DOS has energy, DOS and integrated DOS columns for each
+        # spin channel; only the number of columns is needed
+        tdos_columns = len(f.readline().split())
+        for _ in islice(f, nedos - 1):
+            pass
+
+        pdos_data = OrderedDict()
+        for element in species:
+            # Each PDOS block is preceded by a header line
             f.readline()
-        nedos = int(f.readline().split()[2])
+            block = _read_doscar_block(f, nedos)
+            energies = block[:, 0]
+            ncdij = _doscar_spin_components(tdos_columns,
+                                            block.shape[1] - 1, header_ncdij)
+
+            # Columns are grouped by orbital, with one column per spin
+            # component
+            orbital_data = block[:, 1:].reshape(nedos, -1, ncdij)
+            if ncdij == 2:
+                orbital_data = orbital_data.sum(axis=2)
+            else:
+                orbital_data = orbital_data[:, :, 0]
+
+            if element not in pdos_data:
+                pdos_data[element] = OrderedDict([('energy', energies)])
+            for orbital, columns in _orbital_columns(orbital_data.shape[1]):
+                densities = orbital_data[:, columns].sum(axis=1)
+                if orbital in pdos_data[element]:
+                    pdos_data[element][orbital] = (
+                        pdos_data[element][orbital] + densities)
+                else:
+                    pdos_data[element][orbital] = densities
 
-        # Get number of fields and infer number of spin channels
-        first_dos_line = f.readline().split()
-        spin_channels = (len(first_dos_line) - 1) / 2
-        if spin_channels == 1:
+    return pdos_data
 
-            def _tdos_from_line(line):
-                return (float(line[0]), float(line[1]))
-        elif spin_channels == 2:
 
-            def _tdos_from_line(line):
-                line = [float(x) for x in line]
-                return (line[0], line[1] + line[2])
-        else:
-            raise Exception("Too many columns in DOSCAR")
+def _doscar_spin_components(tdos_columns, pdos_columns, ncdij=0):
+    """Get number of spin components in VASP PDOS data from column counts
+
+    Args:
+        tdos_columns (int): Number of columns in total DOS, including energy
+        pdos_columns (int): Number of PDOS columns, excluding energy
+        ncdij (int): Spin components given in the DOSCAR header, if any.
+            This is only used to distinguish 16 lm-decomposed orbitals
+            (LORBIT = 11) from non-collinear s, p, d and f data.
+
+    Returns:
+        int: 1 (no spin polarisation), 2 (collinear spin-polarised) or 4
+        (non-collinear total and magnetisation)
+    """
+    valid_orbitals = (3, 4, 9, 16)
+    if tdos_columns == 5:
+        candidates = (2,)
+    elif tdos_columns == 3:
+        candidates = (4, 1) if ncdij == 4 else (1, 4)
+    else:
+        raise ValueError("Could not interpret {0} columns of total DOS in "
+                         "DOSCAR".format(tdos_columns))
+
+    for components in candidates:
+        if (pdos_columns % components == 0
+                and pdos_columns // components in valid_orbitals):
+            return components
+    raise ValueError("PDOS data with {0} columns does not match total DOS "
+                     "with {1} columns in DOSCAR".format(pdos_columns,
+                                                         tdos_columns))
 
-        dos_pairs = (
-            [_tdos_from_line(first_dos_line)] +
-            [_tdos_from_line(f.readline().split()) for i in range(nedos - 1)])
 
-        return np.array(dos_pairs)
+def _read_doscar_header(f):
+    """Read the six header lines of an open DOSCAR file"""
+    return [f.readline() for _ in range(6)]
+
+
+def _read_doscar_block(f, nedos):
+    """Parse the next nedos lines of an open DOSCAR file as a 2D array"""
+    return np.loadtxt(islice(f, nedos), ndmin=2)
+
+
+def _orbital_columns(n_orbitals):
+    """Get orbital labels and VASP PDOS column indices summed for each
+
+    Args:
+        n_orbitals (int): Number of orbital columns, excluding spin
+
+    Returns:
+        list: 2-tuples (orbital, slice)
+    """
+    if n_orbitals in (3, 4):
+        # Data summed over m (LORBIT = 10)
+        return [(orbital, slice(i, i + 1))
+                for i, orbital in enumerate('spdf'[:n_orbitals])]
+    elif n_orbitals in (9, 16):
+        # lm-decomposed data (LORBIT = 11)
+        return [(orbital, slice(l**2, (l + 1)**2))
+                for l, orbital in enumerate('spdf'[:int(sqrt(n_orbitals))])]
+    else:
+        raise Exception("Could not interpret {0} orbital columns in "
+                        "VASP PDOS data".format(n_orbitals))
+
+
+def _read_poscar_species(directory):
+    """Get species of each atom from CONTCAR or POSCAR (VASP 5 format)"""
+    for name in ('CONTCAR', 'POSCAR'):
+        poscar = os.path.join(directory, name)
+        if os.path.isfile(poscar):
+            break
+    else:
+        raise ValueError("No CONTCAR or POSCAR found in directory '{0}'. "
+                         "Please provide species.".format(directory))
+
+    with open_file(poscar) as f:
+        lines = [f.readline().split() for _ in range(7)]
+
+    # Labels may include POTCAR variant and hash, e.g. "Sn_d/5f6b1c2d"
+    symbols = [re.split('[_/]', label)[0] for label in lines[5]]
+    counts = lines[6]
+    if not symbols or not all(symbol.isalpha() for symbol in symbols):
+        raise ValueError("Could not read element symbols from {0}; this "
+                         "requires VASP 5 format. Please provide "
+                         "species.".format(poscar))
+
+    return [symbol for symbol, count in zip(symbols, counts)
+            for _ in range(int(count))]
 
 
 def read_vasprun(filename='vasprun.xml'):
@@ -374,7 +784,8 @@ def read_vasprun(filename='vasprun.xml'):
     return dos
 
 
-def read_gpaw_totaldos(filename, npts=50001, width=1e-3, ref='vbm'):
+def read_gpaw_totaldos(filename, npts=50001, width=1e-3, ref='vbm',
+                       sampling=None, xmin=None, xmax=None):
     """Read total DOS from GPAW with minimal broadening
 
     This requires GPAW to be installed and on your PYTHONPATH!
@@ -392,6 +803,15 @@ def read_gpaw_totaldos(filename, npts=50001, width=1e-3, ref='vbm'):
             the valence-band maximum or the Fermi energy, respectively. VBM is
             determined from calculation eigenvalues and not DOS values. If set
             to None, raw values are used.
+        sampling (float): If given, evaluate the DOS directly on an
+            evenly-spaced energy mesh with this spacing instead of sampling
+            npts values. Each eigenvalue is divided between the two nearest
+            mesh points, so no broadening is applied and width is ignored.
+        xmin (float): Minimum energy of mesh, relative to ref. If None, the
+            range of eigenvalues is extended by 5%.
+        xmax (float): Maximum energy of mesh, relative to ref. If None, the
+            range of eigenvalues is extended by 5%.
+
     Returns:
         data (np.ndarray): 2D array of energy and DOS values
     """
@@ -405,11 +825,57 @@ def read_gpaw_totaldos(filename, npts=50001, width=1e-3, ref='vbm'):
     elif ref.lower() == 'efermi':
         ref_energy = calc.get_fermi_level()
 
+    if sampling is not None:
+        levels, weights = _gpaw_levels(calc)
+        x_values = _level_mesh(levels - ref_energy, sampling=sampling,
+                               xmin=xmin, xmax=xmax)
+        dos = _levels_to_mesh(levels - ref_energy, weights, x_values)
+        return np.column_stack((x_values, dos))
+
     energies, dos = calc.get_dos(npts=npts, width=width)
     return np.array(list(zip(energies - ref_energy, dos)))
 
 
-def read_gpaw_pdos(filename, npts=50001, width=1e-3, ref='vbm'):
+def _gpaw_levels(calc, spin=0):
+    """Get eigenvalues (in eV) and k-point weights from GPAW calculator"""
+    k_weights = calc.get_k_point_weights()
+    levels = [calc.get_eigenvalues(kpt=k, spin=spin)
+              for k in range(len(k_weights))]
+    weights = [np.full(len(k_levels), k_weight)
+               for k_levels, k_weight in zip(levels, k_weights)]
+    return np.concatenate(levels), np.concatenate(weights)
+
+
+def _level_mesh(levels, sampling=1e-2, xmin=None, xmax=None):
+    """Get energy mesh covering levels (with 5% padding) unless limits given
+
+    The mesh matches that of :func:`galore.process_1d_data` for the same
+    limits.
+    """
+    from galore import auto_limits
+    auto_xmin, auto_xmax = auto_limits([levels.min(), levels.max()],
+                                       padding=0.05)
+    if xmin is None:
+        xmin = auto_xmin
+    if xmax is None:
+        xmax = auto_xmax
+    return np.arange(xmin, xmax, sampling)
+
+
+def _levels_to_mesh(levels, weights, x_values):
+    """Get density of weighted levels on an evenly-spaced mesh
+
+    Each weight is divided between the two nearest mesh points and scaled
+    by the mesh spacing, so that the density integrates to the total weight.
+    """
+    from galore import xy_to_1d
+    sampling = x_values[1] - x_values[0]
+    return xy_to_1d(np.column_stack((levels, weights)), x_values,
+                    spikes='linear') / sampling
+
+
+def read_gpaw_pdos(filename, npts=50001, width=1e-3, ref='vbm', nproc=1,
+                   sampling=None, xmin=None, xmax=None):
     """Read orbital-projected DOS from GPAW with minimal broadening.
 
     This requires GPAW to be installed and on your PYTHONPATH!
@@ -427,6 +893,13 @@ def read_gpaw_pdos(filename, npts=50001, width=1e-3, ref='vbm'):
             the valence-band maximum or the Fermi energy, respectively. VBM is
             determined from calculation eigenvalues and not DOS values. If set
             to None, raw values are used.
+        nproc (int): Number of worker processes over which to divide the
+            atoms. Each worker reads the calculation file. If None, use all
+            available CPUs.
+        sampling (float): If given, evaluate the PDOS directly on an
+            evenly-spaced energy mesh; see :func:`read_gpaw_totaldos`
+        xmin (float): Minimum energy of mesh, relative to ref
+        xmax (float): Maximum energy of mesh, relative to ref
 
     Returns:
         pdos_data (OrderedDict): PDOS data formatted as nestled OrderedDict of:
@@ -442,24 +915,59 @@ def read_gpaw_pdos(filename, npts=50001, width=1e-3, ref='vbm'):
     elif ref.lower() == 'efermi':
         ref_energy = calc.get_fermi_level()
 
-    # Set up the structure of elements and orbitals.
-    # Repeated elements will leave a single entry in the dict
-    proto_orbitals = OrderedDict((('energy', np.zeros(npts)),
-                                  ('s', np.zeros(npts)),
-                                  ('p', np.zeros(npts)),
-                                  ('d', np.zeros(npts)),
-                                  ('f', np.zeros(npts))))
-    pdos_data = OrderedDict([(atom.symbol, proto_orbitals.copy())
-                             for atom in calc.atoms])
+    if sampling is None:
+        x_values = None
+    else:
+        levels, _ = _gpaw_levels(calc)
+        x_values = _level_mesh(levels - ref_energy, sampling=sampling,
+                               xmin=xmin, xmax=xmax)
+        npts = len(x_values)
 
-    # Read orbital DOS, adding to collected PDOS for that element/orbital
+    # Set up the structure of elements and orbitals.
+    # Repeated elements accumulate into a single set of arrays
+    pdos_data = OrderedDict()
     for atom in calc.atoms:
-        for orbital in 'spdf':
-            energies, dos = calc.get_orbital_ldos(atom.index, angular=orbital,
-                                                  npts=npts, width=width)
-            pdos_data[atom.symbol][orbital] += dos
+        if atom.symbol not in pdos_data:
+            pdos_data[atom.symbol] = OrderedDict(
+                [('energy', x_values)] + [(orbital, np.zeros(npts))
+                                          for orbital in 'spdf'])
+
+    # Only request orbitals for which the atom's setup has projectors;
+    # others would have zero density
+    indices = [atom.index for atom in calc.atoms]
+    atom_orbitals = [''.join(orbital for l, orbital in enumerate('spdf')
+                             if l in calc.wfs.setups[index].l_j)
+                     for index in indices]
+
+    if nproc is None:
+        nproc = os.cpu_count() or 1
+    nproc = min(nproc, len(indices))
+
+    if nproc > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from functools import partial
+
+        with ProcessPoolExecutor(max_workers=nproc,
+                                 initializer=_init_gpaw_worker,
+                                 initargs=(str(filename),)) as executor:
+            results = list(executor.map(
+                partial(_gpaw_worker_ldos, npts=npts, width=width,
+                        x_values=x_values, ref_energy=ref_energy),
+                indices, atom_orbitals,
+                chunksize=max(1, len(indices) // (4 * nproc))))
+    else:
+        results = [_gpaw_atom_ldos(calc, index, orbitals,
+                                   npts=npts, width=width,
+                                   x_values=x_values, ref_energy=ref_energy)
+                   for index, orbitals in zip(indices, atom_orbitals)]
 
-        pdos_data[atom.symbol]['energy'] = energies - ref_energy
+    # Read orbital DOS, adding to collected PDOS for that element/orbital
+    for atom, orbitals, (energies, dos) in zip(calc.atoms, atom_orbitals,
+                                               results):
+        for orbital, orbital_dos in zip(orbitals, dos):
+            pdos_data[atom.symbol][orbital] += orbital_dos
+        if energies is not None and x_values is None:
+            pdos_data[atom.symbol]['energy'] = energies - ref_energy
 
     # Set any zero arrays to None so they can be easily skipped over
     # This should get rid of unused orbitals; if GPAW put some density in those
@@ -472,47 +980,101 @@ def read_gpaw_pdos(filename, npts=50001, width=1e-3, ref='vbm'):
     return pdos_data
 
 
+def _gpaw_atom_ldos(calc, index, orbitals, npts=50001, width=1e-3,
+                    x_values=None, ref_energy=0):
+    """Get orbital-projected DOS of one atom from GPAW calculator
+
+    If x_values is given, the DOS is evaluated on this mesh (relative to
+    ref_energy); otherwise GPAW samples npts values with broadening width.
+
+    Returns:
+        (np.ndarray, list): Energies (or None if no orbitals were given) and
+        DOS array for each orbital
+    """
+    energies, dos = None, []
+    for orbital in orbitals:
+        if x_values is None:
+            energies, orbital_dos = calc.get_orbital_ldos(
+                index, angular=orbital, npts=npts, width=width)
+        else:
+            from ase.units import Hartree
+            from gpaw.utilities.dos import raw_orbital_LDOS
+            levels, weights = raw_orbital_LDOS(calc, index, 0, orbital)
+            energies = x_values
+            orbital_dos = _levels_to_mesh(levels * Hartree - ref_energy,
+                                          weights, x_values)
+        dos.append(orbital_dos)
+    return energies, dos
+
+
+# GPAW calculator held by each worker process of read_gpaw_pdos
+_gpaw_worker_calc = None
+
+
+def _init_gpaw_worker(filename):
+    """Read GPAW calculation once in a worker process"""
+    from gpaw import GPAW
+    global _gpaw_worker_calc
+    _gpaw_worker_calc = GPAW(filename, txt=None)
+
+
+def _gpaw_worker_ldos(index, orbitals, npts=50001, width=1e-3,
+                      x_values=None, ref_energy=0):
+    """Get orbital-projected DOS of one atom in a worker process"""
+    return _gpaw_atom_ldos(_gpaw_worker_calc, index, orbitals,
+                           npts=npts, width=width, x_values=x_values,
+                           ref_energy=ref_energy)
+
+
 def read_vasprun_totaldos(filename='vasprun.xml'):
     """Read an x, y series of energies and DOS from a VASP vasprun.xml file
 
-    Pymatgen must be present on the system to use this method
+    The file is streamed with :func:`read_vasprun_dos`; pymatgen is not
+    required.
 
     Args:
-        filename (str): Path to vasprun.xml file
+        filename (str): Path to vasprun.xml file (which may be compressed)
 
     Returns:
         data (np.ndarray): 2D array of energy and DOS values
     """
-    dos = read_vasprun(filename)
-
-    from pymatgen.electronic_structure.core import Spin
+    dos = read_vasprun_dos(filename)
 
     # sum spin up and spin down channels
-    densities = dos.densities[Spin.up]
-    if len(dos.densities) > 1:
-        densities += dos.densities[Spin.down]
-
-    return np.array(list(zip(dos.energies, densities)))
+    return np.column_stack([dos['energies'],
+                            _sum_spin(dos['densities'], axis=0)])
 
 
 def read_vasprun_pdos(filename='vasprun.xml'):
     """Read a vasprun.xml containing projected density-of-states (PDOS) data
 
-    Pymatgen must be present on the system to use this method
+    Files are streamed with :func:`read_vasprun_dos`. Pymatgen must be
+    present on the system to use a CompleteDos object.
 
     Args:
         filename (str or CompleteDos):
-            Path to vasprun.xml file or pymatgen CompleteDos object.
+            Path to vasprun.xml file (which may be compressed) or pymatgen
+            CompleteDos object.
 
     Returns:
         pdos_data (np.ndarray): PDOS data formatted as nestled OrderedDict of:
             {element: {'energy': energies, 's': densities, 'p' ... }
     """
     if isinstance(filename, str):
-        dos = read_vasprun(filename)
-    else:
-        # filename is actually a pre-loaded CompleteDos
-        dos = filename
+        dos = read_vasprun_dos(filename)
+
+        pdos_data = OrderedDict()
+        for element in sorted(dos['pdos']):
+            pdos_data[element] = OrderedDict([('energy', dos['energies'])])
+            # sum spin up and spin down channels
+            densities = _sum_spin(dos['pdos'][element], axis=0)
+            for orbital, columns in _orbital_columns(densities.shape[1]):
+                pdos_data[element][orbital] = densities[:, columns].sum(
+                    axis=1)
+        return pdos_data
+
+    # filename is actually a pre-loaded CompleteDos
+    dos = filename
 
     from pymatgen.electronic_structure.core import Spin, OrbitalType
 
@@ -532,6 +1094,193 @@ def read_vasprun_pdos(filename='vasprun.xml'):
     return pdos_data
 
 
+def _sum_spin(data, axis=0):
+    """Sum collinear spin channels; take total of non-collinear data"""
+    if data.shape[axis] == 2:
+        return data.sum(axis=axis)
+    else:
+        return data.take(0, axis=axis)
+
+
+def read_vasprun_dos(filename='vasprun.xml'):
+    """Stream density of states from a VASP vasprun.xml file
+
+    Only the atom types, smearing parameters, final eigenvalues and final
+    DOS are read. The XML is parsed incrementally and other elements (e.g.
+    ionic steps and band projections) are discarded as they are read, so
+    memory use does not grow with the size of the file. Pymatgen is not
+    required.
+
+    Energies are shifted in the same way as :func:`read_vasprun`: the zero
+    is the valence-band maximum (or the Fermi level for metals), with a
+    further shift by SIGMA for Gaussian (ISMEAR = 0) or Fermi (ISMEAR = -1)
+    smearing.
+
+    Args:
+        filename (str): Path to vasprun.xml file, which may be compressed
+            (see :func:`open_file`)
+
+    Returns:
+        dict: with keys "energies" (1D array), "densities" (total DOS with
+        shape (n_spin, n_energies)), "efermi", "zero_point" and "pdos". pdos
+        is a dict of site-projected DOS summed over the atoms of each
+        element, each with shape (n_spin, n_energies, n_orbitals) where
+        orbitals are in VASP order; it is empty if the file does not contain
+        projected data.
+    """
+    from xml.etree.ElementTree import iterparse
+
+    species = []
+    parameters = {}
+    eigenvalues = None
+    dos = None
+
+    with open_file(filename, 'rb') as f:
+        stack = []
+        # Depth of element being retained to be parsed when complete
+        keep_depth = 0
+
+        for event, elem in iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                if not keep_depth and _is_vasprun_block(elem, stack):
+                    keep_depth = len(stack) + 1
+                if elem.tag == 'dos' and stack[-1].tag == 'calculation':
+                    # Only the last DOS in the file is used
+                    dos = {'pdos': OrderedDict()}
+                stack.append(elem)
+                continue
+
+            stack.pop()
+            depth = len(stack) + 1
+            if keep_depth and depth > keep_depth:
+                continue
+
+            if depth == keep_depth:
+                keep_depth = 0
+                if elem.tag == 'atominfo':
+                    species = _vasprun_species(elem)
+                elif elem.tag == 'eigenvalues':
+                    eigenvalues = _vasprun_array(elem.find('array'))
+                elif elem.tag == 'total':
+                    total = _vasprun_array(elem.find('array'))
+                    dos['energies'] = total[0, :, 0]
+                    dos['densities'] = total[:, :, 1]
+                else:
+                    # Projections for one ion, labelled "ion N"
+                    element = species[int(elem.get('comment').split()[1])
+                                      - 1]
+                    ion_pdos = _vasprun_array(elem)[:, :, 1:]
+                    if element in dos['pdos']:
+                        dos['pdos'][element] = (dos['pdos'][element]
+                                                + ion_pdos)
+                    else:
+                        dos['pdos'][element] = ion_pdos
+
+            elif elem.tag == 'i':
+                name = elem.get('name')
+                if name == 'efermi' and stack[-1].tag == 'dos':
+                    dos['efermi'] = float(elem.text)
+                elif (name in ('ISMEAR', 'SIGMA')
+                      and any(e.tag == 'parameters' for e in stack)):
+                    parameters[name] = float(elem.text)
+
+            # Discard elements which have been read
+            if stack:
+                stack[-1].remove(elem)
+
+    if dos is None:
+        raise ValueError("No DOS found in file {0}".format(filename))
+
+    efermi = dos['efermi']
+    zero_point = _vasprun_zero_point(eigenvalues, efermi)
+    if parameters.get('ISMEAR') in (0, -1):
+        zero_point += parameters['SIGMA']
+
+    return {'energies': dos['energies'] - zero_point,
+            'densities': dos['densities'],
+            'efermi': efermi,
+            'zero_point': zero_point,
+            'pdos': dos['pdos']}
+
+
+def _is_vasprun_block(elem, stack):
+    """Check if a vasprun.xml element is to be kept and parsed
+
+    Args:
+        elem (xml.etree.ElementTree.Element): Element at start event
+        stack (list): Parent elements, outermost first
+    """
+    if elem.tag == 'atominfo':
+        return True
+    elif elem.tag == 'eigenvalues':
+        return stack[-1].tag == 'calculation'
+    elif elem.tag == 'total':
+        return stack[-1].tag == 'dos'
+    elif elem.tag == 'set':
+        # <partial><array><set><set comment="ion 1">
+        return (len(stack) > 3 and stack[-3].tag == 'partial'
+                and elem.get('comment', '').startswith('ion'))
+    else:
+        return False
+
+
+def _vasprun_array(elem):
+    """Parse numerical data from nested <set> elements of vasprun.xml
+
+    Args:
+        elem (xml.etree.ElementTree.Element): <array> or <set> element
+
+    Returns:
+        np.ndarray: with a dimension for each level of nested sets, and rows
+        of data in last dimension
+    """
+    shape = []
+    outer = elem if elem.tag == 'set' else elem.find('set')
+    level = outer
+    while level.find('set') is not None:
+        shape.append(len(level))
+        level = level[0]
+    shape.append(len(level))
+
+    values = ' '.join(row.text for row in outer.iter('r')).split()
+    return np.array(values, dtype=float).reshape(shape + [-1])
+
+
+def _vasprun_species(atominfo):
+    """Get element symbol of each atom from vasprun.xml <atominfo>"""
+    for array in atominfo.findall('array'):
+        if array.get('name') == 'atoms':
+            return [rc[0].text.strip() for rc in array.find('set')]
+    raise ValueError("Could not find atom types in vasprun.xml")
+
+
+def _vasprun_zero_point(eigenvalues, efermi, tolerance=1e-4):
+    """Get valence-band maximum, or Fermi energy for metals
+
+    Args:
+        eigenvalues (np.ndarray or None): Eigenvalues and occupations with
+            shape (n_spin, n_kpoints, n_bands, 2)
+        efermi (float): Fermi energy
+        tolerance (float): Distance from Fermi energy within which bands are
+            not considered to cross it
+
+    Returns:
+        float: reference energy
+    """
+    if eigenvalues is None:
+        return efermi
+
+    energies = eigenvalues[..., 0]
+    # A band crosses the Fermi energy if it lies on both sides at different
+    # k-points
+    crosses = (np.any(energies < efermi - tolerance, axis=1)
+               & np.any(energies > efermi + tolerance, axis=1))
+    if crosses.any():
+        return efermi
+    else:
+        return float(energies[energies < efermi].max())
+
+
 def read_vasp_raman(filename="vasp_raman.dat"):
     """Read output file from Vasp raman simulation
 
@@ -549,5 +1298,208 @@ def read_vasp_raman(filename="vasp_raman.dat"):
             retained.
     """
 
-    data = np.genfromtxt(filename)
+    with open_file(filename) as f:
+        data = np.genfromtxt(f)
     return data[:, [1, -1]]
+
+
+# Number of bytes read from the start of a file to identify its format
+HEAD_SIZE = 4096
+
+# Filename suffixes of compressed files, which are ignored when checking
+# extensions
+COMPRESSION_EXTENSIONS = ('gz', 'bz2', 'xz', 'zip')
+
+# Leading bytes of compressed files
+_COMPRESSION_MAGIC = ((b'\x1f\x8b', 'gzip'),
+                      (b'BZh', 'bz2'),
+                      (b'\xfd7zXZ\x00', 'xz'),
+                      (b'PK\x03\x04', 'zip'))
+
+
+def open_file(filename, mode='rt'):
+    """Open a file for reading, decompressing gzip, bz2, xz or zip data
+
+    Compression is identified from the first bytes of the file rather than
+    its name. Data is decompressed as it is read, so compressed files are
+    never held in memory or written to disk in full. A zip archive must
+    contain exactly one file.
+
+    Args:
+        filename (str): Path to file
+        mode (str): "rt" (or "r") to read text, "rb" to read bytes
+
+    Returns:
+        File object
+    """
+    if mode not in ('r', 'rt', 'rb'):
+        raise ValueError('File mode "{0}" not supported; use "rt" or '
+                         '"rb".'.format(mode))
+
+    f = open(filename, 'rb')
+    try:
+        magic = f.read(6)
+        f.seek(0)
+        for signature, compression in _COMPRESSION_MAGIC:
+            if magic.startswith(signature):
+                break
+        else:
+            return f if mode == 'rb' else io.TextIOWrapper(f)
+
+        # Decompress from the same file handle rather than reopening
+        if compression == 'gzip':
+            import gzip
+            stream = gzip.GzipFile(fileobj=f, mode='rb')
+        elif compression == 'bz2':
+            import bz2
+            stream = bz2.BZ2File(f)
+        elif compression == 'xz':
+            import lzma
+            stream = lzma.LZMAFile(f)
+        else:
+            import zipfile
+            # The archive remains readable until the member is closed
+            with zipfile.ZipFile(f) as archive:
+                members = [info for info in archive.infolist()
+                           if not info.is_dir()]
+                if len(members) != 1:
+                    raise ValueError('Zip archive {0} should contain exactly '
+                                     'one file.'.format(filename))
+                stream = archive.open(members[0])
+    except BaseException:
+        f.close()
+        raise
+
+    stream = _CompressedReader(stream, f)
+    return stream if mode == 'rb' else io.TextIOWrapper(stream)
+
+
+class _CompressedReader(io.BufferedReader):
+    """Buffered decompressing stream which also closes the compressed file
+
+    The decompressors do not close file objects passed to them, so this
+    closes the underlying file along with the stream.
+    """
+    def __init__(self, stream, fileobj):
+        super().__init__(stream)
+        self._fileobj = fileobj
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._fileobj.close()
+
+
+def read_head(filename, size=HEAD_SIZE):
+    """Read the first lines of a text file
+
+    Args:
+        filename (str): Path to file
+        size (int): Number of bytes to read. The last line may be incomplete.
+
+    Returns:
+        list: Lines of text, without line endings
+    """
+    with open_file(filename, 'rb') as f:
+        head = f.read(size)
+    return head.decode('utf-8', errors='replace').splitlines()
+
+
+def _file_extension(filename):
+    """Get lower-case extension of filename, ignoring a compression suffix"""
+    parts = os.path.basename(str(filename)).lower().split('.')
+    if len(parts) > 2 and parts[-1] in COMPRESSION_EXTENSIONS:
+        parts.pop()
+    return parts[-1] if len(parts) > 1 else ''
+
+
+def register_reader(name, reader=None, extensions=(), signature=None,
+                    pdos_reader=None):
+    """Add an input format to those identified by :func:`detect_format`
+
+    Registered formats are tried before those already known (see
+    :func:`detect_format`), so this may also be used to override a built-in
+    format (or replace one, if the name is the same).
+
+    Args:
+        name (str): Name of format
+        reader (function): Function taking a filename and returning a 2D
+            array of x and y values, as :func:`read_csv`. This is used by
+            :func:`galore.process_1d_data`.
+        extensions (iterable): Filename extensions (without ".") of this
+            format. Compressed files with a suffix such as ".gz" are also
+            matched.
+            If empty, any extension is accepted.
+        signature (function): Function taking a list of the first lines of
+            a file (see :func:`read_head`) and returning True if the file is
+            of this format. If None, only the extension is checked.
+        pdos_reader (function): Function taking a filename and returning
+            orbital-projected data in the format of
+            :func:`read_vasprun_pdos`. This is used by
+            :func:`galore.process_pdos`.
+    """
+    INPUT_FORMATS[name] = {'reader': reader,
+                           'pdos_reader': pdos_reader,
+                           'extensions': tuple(ext.lower().lstrip('.')
+                                               for ext in extensions),
+                           'signature': signature}
+    INPUT_FORMATS.move_to_end(name, last=False)
+
+
+def detect_format(filename):
+    """Identify format of input file
+
+    Formats in :data:`INPUT_FORMATS` are checked in order, first by
+    extension and then by content. Formats listing the file's extension are
+    checked before those accepting any extension, so a file with a known
+    extension is usually identified without opening it. Otherwise the start
+    of the file is read once and shared between the content signatures.
+
+    Args:
+        filename (str): Path to input file
+
+    Returns:
+        str: Name of format, as a key of :data:`INPUT_FORMATS`
+    """
+    extension = _file_extension(filename)
+    head = None
+
+    # Stable sort keeps the order within each group
+    for name, input_format in sorted(
+            INPUT_FORMATS.items(), key=lambda item: not item[1]['extensions']):
+        if (input_format['extensions']
+                and extension not in input_format['extensions']):
+            continue
+        if input_format['signature'] is not None:
+            if head is None:
+                head = read_head(filename)
+            if not input_format['signature'](head):
+                continue
+        return name
+
+    raise ValueError('Format of input file {0} not recognised'.format(
+        filename))
+
+
+# Known input formats, in the order they are checked; see register_reader.
+# Text files which do not match any other format are read with read_txt.
+INPUT_FORMATS = OrderedDict([
+    ('vasprun', {'reader': read_vasprun_totaldos,
+                 'pdos_reader': read_vasprun_pdos,
+                 'extensions': ('xml',), 'signature': None}),
+    ('gpaw', {'reader': read_gpaw_totaldos,
+              'pdos_reader': read_gpaw_pdos,
+              'extensions': ('gpw',), 'signature': None}),
+    ('doscar', {'reader': read_doscar,
+                'pdos_reader': read_doscar_pdos,
+                'extensions': (), 'signature': _is_doscar_head}),
+    ('vasp_raman', {'reader': read_vasp_raman,
+                    'pdos_reader': None,
+                    'extensions': (), 'signature': _is_vasp_raman_head}),
+    ('csv', {'reader': read_csv,
+             'pdos_reader': None,
+             'extensions': ('csv',), 'signature': None}),
+    ('txt', {'reader': read_txt,
+             'pdos_reader': None,
+             'extensions': (), 'signature': None})])
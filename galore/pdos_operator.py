@@ -0,0 +1,268 @@
+"""Precompiled resampling, broadening and weighting of PDOS data
+
+Resampling, broadening and cross-section weighting of orbital-projected
+data are all linear operations which depend only on the source energy grid
+and the processing parameters. When many calculations share a grid (e.g. a
+high-throughput set of VASP runs with the same NEDOS, EMIN and EMAX), the
+pipeline of :func:`galore.process_pdos` can be compiled once with
+:func:`compile_pdos_operator` and applied to each data set with
+:func:`apply_pdos_operator`. Compiled operators may be written to file with
+:func:`save_pdos_operator` and read back (e.g. by worker processes) with
+:func:`load_pdos_operator`.
+
+"""
+
+from collections import OrderedDict
+import logging
+from numbers import Real
+
+import numpy as np
+from scipy.fft import irfft, next_fast_len, rfft
+from scipy.sparse import csr_matrix
+
+import galore
+from galore import auto_limits
+
+
+def compile_pdos_operator(energies, elements=None,
+                          gaussian=None, lorentzian=None,
+                          weighting=None, sampling=1e-2,
+                          xmin=None, xmax=None, flipx=False, tolerance=None,
+                          method='auto', rebin=False):
+    """Compile PDOS processing for a source energy grid
+
+    Parameters are as for :func:`galore.process_pdos`; the x-axis limits,
+    if not given, are determined from the energies in the same way.
+
+    Args:
+        energies (np.array): Energy values of the PDOS data to be processed.
+            All elements must share this grid.
+        elements (iterable): Element symbols, required to look up
+            cross-sections if weighting is used.
+        gaussian (float): Gaussian broadening width
+        lorentzian (float): Lorentzian broadening width
+        weighting (str or float): Cross-section data for weighting, as for
+            :func:`galore.get_cross_sections`
+        sampling (float): Spacing of output x-values
+        xmin (float): Minimum output x-value
+        xmax (float): Maximum output x-value
+        flipx (bool): Limits are specified as binding energies
+        tolerance (float): Broadening truncation tolerance; see
+            :func:`galore.broaden`
+        method (str): "fft" (or "auto") uses sampled broadening functions
+            and gives the same results as :func:`galore.process_pdos`;
+            "analytic" uses their analytic Fourier transforms. "direct" is
+            treated as "fft": a compiled operator is always applied in
+            Fourier space, and direct and FFT convolution with the same
+            sampled kernel agree to within rounding.
+        rebin (bool): Resample by averaging over bins; see
+            :func:`galore.xy_to_1d`
+
+    Returns:
+        dict: Compiled operator with keys "energies", "x_values",
+        "resampling" (sparse resampling matrix), "transfer" (Fourier
+        transform of broadening function, or None), "n_fft", "offset" and
+        "weights" (nested dict of cross-sections, or None)
+    """
+    energies = np.array(energies, dtype=float)
+    d = sampling
+
+    auto_xmin, auto_xmax = auto_limits(energies, padding=0.05)
+    if xmax is None:
+        xmax = auto_xmax
+    if xmin is None:
+        xmin = auto_xmin
+    if flipx:
+        xmin, xmax = -xmax, -xmin
+
+    x_values = np.arange(xmin, xmax, d)
+    n_points = len(x_values)
+
+    broadening = galore._broadening_params(gaussian=gaussian,
+                                           lorentzian=lorentzian)
+    if broadening is None:
+        transfer, n_fft, offset = None, 0, 0
+    else:
+        dist, width = broadening
+        if not galore._is_fixed_width(width):
+            raise ValueError('Energy-dependent broadening widths cannot be '
+                             'compiled; use galore.process_pdos.')
+        pad = galore._kernel_pad(dist, width, d=d, tolerance=tolerance)
+
+        if method == 'analytic':
+            n_fft = next_fast_len(
+                n_points + galore._analytic_pad_points(pad, d, n_points),
+                real=True)
+            transfer = galore._transfer_function(dist, width, n_fft, d)
+            offset = 0
+        elif method in ('auto', 'fft', 'direct'):
+            kernel_key = (dist, width, pad, d, 'float64')
+            kernel, offset = galore._cached_kernel(*kernel_key)
+            n_fft = next_fast_len(len(kernel) + n_points - 1, real=True)
+            transfer = np.array(galore._kernel_fft(kernel_key, n_fft))
+        else:
+            raise ValueError('Convolution method "{0}" not known. Use '
+                             '"fft", "direct", "analytic" or '
+                             '"auto".'.format(method))
+
+    if weighting:
+        if elements is None:
+            raise ValueError('Elements must be specified to compile '
+                             'cross-section weighting.')
+        cross_sections = galore.get_cross_sections(weighting,
+                                                   elements=elements)
+        weights = OrderedDict(
+            (element, OrderedDict(
+                (orbital, None if cs is None else float(cs))
+                for orbital, cs in cross_sections.get(element, {}).items()
+                if cs is None or isinstance(cs, Real)))
+            for element in elements)
+    else:
+        weights = None
+
+    return {'energies': energies,
+            'x_values': x_values,
+            'resampling': galore.resampling_matrix(energies, x_values,
+                                                   rebin=rebin),
+            'transfer': transfer,
+            'n_fft': n_fft,
+            'offset': offset,
+            'weights': weights}
+
+
+def apply_pdos_operator(operator, pdos_data):
+    """Resample, broaden and weight PDOS data with a compiled operator
+
+    Args:
+        operator (dict): Compiled operator from
+            :func:`compile_pdos_operator` or :func:`load_pdos_operator`
+        pdos_data (dict): PDOS data in format::
+
+                {'el1': {'energy': values, 's': values, 'p': values ...},
+                 'el2': {'energy': values, 's': values, ...}, ...}
+
+            e.g. from :func:`galore.formats.read_vasprun_pdos`. Energies must
+            match those used to compile the operator.
+
+    Returns:
+        dict: Processed data in the same format as
+        :func:`galore.process_pdos`. If weighting was compiled, orbitals
+        without cross-section data (or with a cross-section of None) are
+        dropped.
+    """
+    x_values = operator['x_values']
+    n_points = len(x_values)
+
+    channels = [(element, orbital)
+                for element, el_data in pdos_data.items()
+                for orbital, orb_data in el_data.items()
+                if orbital != 'energy' and orb_data is not None]
+
+    for element, el_data in pdos_data.items():
+        if not np.array_equal(el_data['energy'], operator['energies']):
+            raise ValueError('Energies of element {0} do not match the '
+                             'compiled operator.'.format(element))
+
+    processed_data = OrderedDict(
+        (element, OrderedDict([('energy', x_values)]))
+        for element in pdos_data)
+    if not channels:
+        return processed_data
+
+    orbital_data = np.column_stack([pdos_data[element][orbital]
+                                    for element, orbital in channels])
+    data = np.ascontiguousarray((operator['resampling'] @ orbital_data).T)
+
+    if operator['transfer'] is not None:
+        n_fft, offset = operator['n_fft'], operator['offset']
+        data_fft = rfft(data, n_fft, axis=-1)
+        data_fft *= operator['transfer']
+        data = irfft(data_fft, n_fft, axis=-1,
+                     overwrite_x=True)[:, offset:offset + n_points]
+
+    weights = operator['weights']
+    for (element, orbital), row in zip(channels, data):
+        if weights is None:
+            processed_data[element][orbital] = row
+        elif orbital not in weights.get(element, {}):
+            logging.warning("Could not find cross-section data for element "
+                            "{0}, orbital {1}. Skipping this "
+                            "orbital.".format(element, orbital))
+        elif weights[element][orbital] is not None:
+            processed_data[element][orbital] = row * weights[element][orbital]
+
+    return processed_data
+
+
+def save_pdos_operator(operator, filename):
+    """Write compiled PDOS operator to a numpy .npz file
+
+    Args:
+        operator (dict): Compiled operator from
+            :func:`compile_pdos_operator`
+        filename (str): Output file
+    """
+    resampling = operator['resampling'].tocsr()
+    weights = operator['weights']
+    if weights is None:
+        weight_items = []
+    else:
+        weight_items = [(element, orbital, cs)
+                        for element, orbitals in weights.items()
+                        for orbital, cs in orbitals.items()]
+
+    transfer = operator['transfer']
+    np.savez(filename,
+             energies=operator['energies'],
+             x_values=operator['x_values'],
+             resampling_data=resampling.data,
+             resampling_indices=resampling.indices,
+             resampling_indptr=resampling.indptr,
+             resampling_shape=np.array(resampling.shape),
+             transfer=(np.zeros(0, dtype=complex) if transfer is None
+                       else transfer),
+             n_fft=operator['n_fft'],
+             offset=operator['offset'],
+             weighted=weights is not None,
+             weight_elements=np.array([item[0] for item in weight_items],
+                                      dtype=str),
+             weight_orbitals=np.array([item[1] for item in weight_items],
+                                      dtype=str),
+             weight_values=np.array([np.nan if item[2] is None else item[2]
+                                     for item in weight_items], dtype=float))
+
+
+def load_pdos_operator(filename):
+    """Read compiled PDOS operator from file
+
+    Args:
+        filename (str): File written by :func:`save_pdos_operator`
+
+    Returns:
+        dict: Compiled operator
+    """
+    with np.load(filename) as data:
+        resampling = csr_matrix((data['resampling_data'],
+                                 data['resampling_indices'],
+                                 data['resampling_indptr']),
+                                shape=tuple(data['resampling_shape']))
+
+        if data['weighted']:
+            weights = OrderedDict()
+            for element, orbital, cs in zip(data['weight_elements'],
+                                            data['weight_orbitals'],
+                                            data['weight_values']):
+                weights.setdefault(str(element), OrderedDict())
+                weights[str(element)][str(orbital)] = (
+                    None if np.isnan(cs) else float(cs))
+        else:
+            weights = None
+
+        n_fft = int(data['n_fft'])
+        return {'energies': data['energies'],
+                'x_values': data['x_values'],
+                'resampling': resampling,
+                'transfer': data['transfer'] if n_fft else None,
+                'n_fft': n_fft,
+                'offset': int(data['offset']),
+                'weights': weights}
@@ -1,17 +1,19 @@
+from collections import OrderedDict
 import os
 from os.path import join as path_join
 import sys
 import unittest
+from unittest.mock import patch
 import shutil
 import tempfile
 
 import numpy.testing
-from numpy.testing import assert_array_equal
+from numpy.testing import assert_array_equal, assert_array_almost_equal
 import numpy as np
 
 import galore
 import galore.formats
-from galore.cli.galore import simple_dos_from_files
+from galore.cli.galore import get_parser, main, run, simple_dos_from_files
 import galore.plot
 
 from contextlib import contextmanager
@@ -25,6 +27,12 @@ try:
 except ImportError:
     has_pymatgen = False
 
+try:
+    import h5py
+    has_h5py = True
+except ImportError:
+    has_h5py = False
+
 
 @contextmanager
 def stdout_redirect():
@@ -114,6 +122,16 @@ class test_array_functions(unittest.TestCase):
                 spikes=True),
             np.array([0., 0., 0.6, 0., 0.2, 0.3]))
 
+    def test_xy_to_1d_linear_spikes(self):
+        """Check resampling of distinct values shared between neighbours"""
+        xy = np.array([[2.25, 1.], [5.5, 2.], [-0.5, 1.], [9.5, 1.]])
+        resampled = galore.xy_to_1d(xy, range(10), spikes='linear')
+        assert_array_almost_equal(
+            resampled,
+            np.array([0.5, 0., 0.75, 0.25, 0., 1., 1., 0., 0., 0.5]))
+        self.assertAlmostEqual(
+            np.sum(resampled[1:8] * np.arange(1, 8)) / 3., (2.25 + 11.) / 3)
+
     def test_xy_to_1d_linear(self):
         """Check resampling with linear interpolation"""
         assert_array_equal(
@@ -122,6 +140,54 @@ class test_array_functions(unittest.TestCase):
                 spikes=False),
             np.array([0., 0.5, 1.0, 1.5, 0., 0.0]))
 
+    def test_xy_to_1d_unsorted(self):
+        """Check resampling of decreasing and unordered data"""
+        for xy in ([[3., 1.5], [1., 0.5]],
+                   [[3., 1.5], [1., 0.5], [2., 1.0]]):
+            assert_array_equal(
+                galore.xy_to_1d(np.array(xy), range(6)),
+                np.array([0., 0.5, 1.0, 1.5, 0., 0.0]))
+
+    def test_resampling_matrix(self):
+        """Check sparse resampling matrix matches xy_to_1d"""
+        xy = np.array([[3.2, 1.5], [1., 0.5], [2.1, 1.0], [4.8, 0.3]])
+        x_values = np.arange(-1., 6., 0.5)
+        for spikes in (False, True, 'linear'):
+            assert_array_almost_equal(
+                galore.resampling_matrix(xy[:, 0], x_values,
+                                         spikes=spikes) @ xy[:, 1],
+                galore.xy_to_1d(xy, x_values, spikes=spikes))
+
+    def test_xy_to_1d_rebin(self):
+        """Check rebinning conserves area and matches resampling matrix"""
+        x = np.linspace(0., 4., 401)
+        xy = np.column_stack([x, np.exp(-10 * (x - 2.03)**2)])
+        x_values = np.arange(-1., 6., 0.5)
+        rebinned = galore.xy_to_1d(xy, x_values, rebin=True)
+        self.assertAlmostEqual(
+            rebinned.sum() * 0.5,
+            np.sum(0.5 * np.diff(x) * (xy[1:, 1] + xy[:-1, 1])))
+        assert_array_almost_equal(
+            galore.resampling_matrix(x, x_values, rebin=True) @ xy[:, 1],
+            rebinned)
+
+        # Spikes cannot be rebinned, whichever broadening method is used
+        with self.assertRaises(ValueError):
+            galore.xy_to_1d(xy, x_values, spikes=True, rebin=True)
+        with self.assertRaises(ValueError):
+            galore.process_1d_data(
+                input=path_join(test_dir, 'test_xy_data.csv'), gaussian=3.,
+                spikes=True, rebin=True)
+
+    def test_xy_to_1d_out(self):
+        """Check resampling into a preallocated array"""
+        out = np.full(6, 9.)
+        result = galore.xy_to_1d(
+            np.array([[2.1, 0.6], [4.3, 0.2], [5.1, 0.3]]), range(6),
+            spikes=True, out=out)
+        self.assertIs(result, out)
+        assert_array_equal(out, np.array([0., 0., 0.6, 0., 0.2, 0.3]))
+
     def test_gaussian(self):
         self.assertAlmostEqual(galore.gaussian(3., f0=1, fwhm=(3 * 2.35482)),
                                0.8007374029168)
@@ -146,6 +212,80 @@ class test_io_functions(unittest.TestCase):
         self.assertTrue(galore.formats.is_doscar(doscar_path))
         self.assertFalse(galore.formats.is_doscar(raman_path))
 
+    def test_detect_format(self):
+        for filename, input_format in (
+                ('DOSCAR.1', 'doscar'),
+                (path_join('CaF2', 'raman_lda_500.dat'), 'vasp_raman'),
+                (path_join('SnO2', 'vasprun.xml.gz'), 'vasprun'),
+                ('test_xy_data.csv', 'csv'),
+                (path_join('MgO', 'MgO_Mg_dos.dat'), 'txt')):
+            self.assertEqual(
+                galore.formats.detect_format(path_join(test_dir, filename)),
+                input_format)
+
+        # Known extensions are identified without opening the file
+        self.assertEqual(galore.formats.detect_format(
+            path_join(self.tempdir, 'missing.csv.gz')), 'csv')
+
+    def test_compressed_input(self):
+        """Check compressed files are identified and read like originals"""
+        import bz2
+        import gzip
+        import lzma
+        import zipfile
+
+        for name, reader in (('DOSCAR.1', galore.formats.read_doscar),
+                             ('test_xy_data.csv', galore.formats.read_csv)):
+            with open(path_join(test_dir, name), 'rb') as f:
+                contents = f.read()
+            reference = reader(path_join(test_dir, name))
+
+            for extension, opener in (('gz', gzip.open), ('bz2', bz2.open),
+                                      ('xz', lzma.open), ('zip', None)):
+                filename = path_join(self.tempdir,
+                                     '.'.join((name, extension)))
+                if opener is None:
+                    with zipfile.ZipFile(filename, 'w') as archive:
+                        archive.writestr(name, contents)
+                else:
+                    with opener(filename, 'wb') as f:
+                        f.write(contents)
+
+                self.assertEqual(
+                    galore.formats.detect_format(filename),
+                    galore.formats.detect_format(path_join(test_dir, name)))
+                assert_array_equal(reader(filename), reference)
+
+        filename = path_join(self.tempdir, 'two_files.zip')
+        with zipfile.ZipFile(filename, 'w') as archive:
+            archive.writestr('a.csv', '1,2\n')
+            archive.writestr('b.csv', '3,4\n')
+        with self.assertRaises(ValueError):
+            galore.formats.read_csv(filename)
+
+    def test_register_reader(self):
+        """Check registered formats take priority and are used for input"""
+        filename = path_join(self.tempdir, 'spectrum.dat')
+        with open(filename, 'w') as f:
+            f.write('MY FORMAT\n1.0 2.0\n3.0 1.0\n')
+
+        def read_my_format(filename):
+            return np.loadtxt(filename, skiprows=1)
+
+        galore.formats.register_reader(
+            'my_format', read_my_format, extensions=('dat',),
+            signature=lambda lines: lines[0] == 'MY FORMAT')
+        try:
+            self.assertEqual(galore.formats.detect_format(filename),
+                             'my_format')
+            self.assertEqual(galore.formats.detect_format(
+                path_join(test_dir, 'DOSCAR.1')), 'doscar')
+            x_values, _ = galore.process_1d_data(input=filename, xmin=0,
+                                                 xmax=4, sampling=1)
+            assert_array_equal(x_values, [0, 1, 2, 3])
+        finally:
+            del galore.formats.INPUT_FORMATS['my_format']
+
     def test_write_txt(self):
         x_values = range(5)
         y_values = [x**2 / 200 for x in range(5)]
@@ -187,12 +327,154 @@ class test_io_functions(unittest.TestCase):
                 header=["Frequency", "Value"])
             self.assertEqual(stdout.getvalue(), csv_test_string)
 
+    def test_write_array_chunks(self):
+        """Check block-formatted arrays match row-by-row formatting"""
+        data = np.random.RandomState(1).rand(1000, 3) * 1e3
+        txt_filename = path_join(self.tempdir, 'write_test.txt')
+        csv_filename = path_join(self.tempdir, 'write_test.csv')
+        with patch('galore.formats.WRITE_CHUNK_SIZE', 100):
+            galore.formats._write_txt_rows(data, filename=txt_filename)
+            galore.formats._write_csv_rows(data, filename=csv_filename)
+
+        with open(txt_filename, 'r') as f:
+            self.assertEqual(f.read(), ''.join(
+                ' '.join('{0:10.6e}'.format(x) for x in row) + '\n'
+                for row in data))
+        with open(csv_filename, 'r') as f:
+            self.assertEqual(f.read(), ''.join(
+                ','.join(str(x) for x in row) + os.linesep for row in data))
+
+    def test_write_pdos_binary(self):
+        """Check PDOS columns and metadata survive npz/hdf5 round trip"""
+        energy = np.linspace(-2, 2, 9)
+        pdos = OrderedDict([
+            ('Zn', OrderedDict([('energy', energy), ('s', energy**2),
+                                ('d', np.ones(9))])),
+            ('O', OrderedDict([('energy', energy), ('p', 2 * energy)]))])
+        metadata = {'gaussian': 0.3, 'weighting': 'alka', 'units': 'eV'}
+
+        filetypes = [('npz', galore.formats.read_npz)]
+        if has_h5py:
+            filetypes.append(('hdf5', galore.formats.read_hdf5))
+
+        for filetype, reader in filetypes:
+            for compression in (False, True):
+                filename = path_join(self.tempdir, 'pdos.' + filetype)
+                galore.formats.write_pdos(pdos, filename=filename,
+                                          filetype=filetype, flipx=True,
+                                          metadata=metadata,
+                                          compression=compression)
+                columns, file_metadata = reader(filename)
+                self.assertEqual(list(columns), ['energy', 'total', 'Zn/s',
+                                                 'Zn/d', 'O/p'])
+                self.assertEqual(file_metadata, metadata)
+                assert_array_equal(columns['energy'], -energy)
+                assert_array_equal(columns['Zn/s'], energy**2)
+                assert_array_almost_equal(columns['total'],
+                                          energy**2 + 1 + 2 * energy)
+
+                columns, _ = reader(filename, columns=['O/p'])
+                self.assertEqual(list(columns), ['O/p'])
+                assert_array_equal(columns['O/p'], 2 * energy)
+
+    def test_write_pdos_float32(self):
+        """Check single-precision PDOS is written at its own precision"""
+        energy = np.linspace(-2, 2, 5)
+        values = np.float32([0.42667267, 0.1, 0.2, 0.3, 1.1])
+        pdos = OrderedDict([('Zn', OrderedDict([('energy', energy),
+                                                ('s', values),
+                                                ('p', 2 * values)]))])
+        filename = path_join(self.tempdir, 'pdos.csv')
+        galore.formats.write_pdos(pdos, filename=filename, filetype='csv')
+        with open(filename) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(lines[1].split(','),
+                         ['-2.0', str(3 * values[0]), '0.42667267',
+                          str(2 * values[0])])
+        self.assertEqual(lines[2].split(','), ['-1.0', '0.3', '0.1', '0.2'])
+
+    @unittest.skipUnless(has_h5py, "requires h5py")
+    def test_write_hdf5_chunks(self):
+        filename = path_join(self.tempdir, 'chunks.h5')
+        galore.formats.write_hdf5({'x': np.arange(100.)}, filename,
+                                  chunks=16, compression='gzip')
+        with h5py.File(filename, 'r') as f:
+            self.assertEqual(f['x'].chunks, (16,))
+            assert_array_equal(f['x'][20:30], np.arange(20., 30.))
+
+    def test_write_sweep_npz(self):
+        x_values = np.linspace(0, 1, 5)
+        widths = np.array([[0.1, 0.2], [0.3, 0.4]])
+        spectra = np.random.RandomState(1).rand(2, 5)
+        filename = path_join(self.tempdir, 'sweep.npz')
+        galore.formats.write_sweep(x_values, widths, spectra,
+                                   filename=filename)
+        with np.load(filename) as data:
+            assert_array_equal(data['x'], x_values)
+            assert_array_equal(data['lorentzian'], widths[:, 0])
+            assert_array_equal(data['gaussian'], widths[:, 1])
+            assert_array_equal(data['spectra'], spectra)
+
+    def test_sweep_cli(self):
+        """Check sweep options are applied or rejected from the command line"""
+        input_file = path_join(test_dir, 'test_xy_data.csv')
+        spectra = {}
+        for method in ('fft', 'direct'):
+            filename = path_join(self.tempdir, method + '.npz')
+            args = get_parser().parse_args(
+                [input_file, '--sweep', filename, '--sweep-gaussian', '2',
+                 '3', '-l', '1', '--method', method])
+            run(**vars(args))
+            with np.load(filename) as data:
+                spectra[method] = data['spectra']
+        assert_array_almost_equal(spectra['direct'], spectra['fft'])
+
+        # Energy-dependent widths and PDOS are argument errors
+        for options, message in ((['-g', '0.3', '--gaussian-coeffs', '0.1'],
+                                  'energy-dependent'),
+                                 (['--pdos'], '--pdos')):
+            argv = ['galore', input_file, '--sweep',
+                    path_join(self.tempdir, 'sweep.csv')] + options
+            with patch('sys.argv', argv), patch('sys.stderr', io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    main()
+                self.assertIn(message, sys.stderr.getvalue())
+
     def test_read_spinpol_doscar(self):
         doscar_path = path_join(test_dir, 'DOSCAR.1')
         data = galore.formats.read_doscar(doscar_path)
         self.assertEqual(data[20, 0], -31.795)
         self.assertEqual(data[14, 1], 0.329)
 
+    def test_read_doscar_pdos(self):
+        doscar_path = path_join(test_dir, 'DOSCAR_pdos', 'DOSCAR')
+        for species in (None, ['Zn', 'O', 'O']):
+            data = galore.formats.read_doscar_pdos(doscar_path,
+                                                   species=species)
+            self.assertEqual(list(data), ['Zn', 'O'])
+            self.assertEqual(list(data['O']), ['energy', 's', 'p', 'd'])
+            assert_array_almost_equal(data['Zn']['energy'],
+                                      [-2., -1., 0., 1., 2.])
+            assert_array_almost_equal(data['Zn']['s'],
+                                      0.03 * np.arange(1, 6))
+            assert_array_almost_equal(data['O']['p'],
+                                      1.65 * np.arange(1, 6))
+            assert_array_almost_equal(data['O']['d'],
+                                      6.75 * np.arange(1, 6))
+
+        with self.assertRaises(ValueError):
+            galore.formats.read_doscar_pdos(doscar_path, species=['Zn'])
+
+        # Spin components are found from the data, not the header
+        with open(doscar_path) as f:
+            lines = f.readlines()
+        unset_path = path_join(self.tempdir, 'DOSCAR')
+        with open(unset_path, 'w') as f:
+            f.writelines(['   3   3   1   0\n'] + lines[1:])
+        data = galore.formats.read_doscar_pdos(unset_path,
+                                               species=['Zn', 'O', 'O'])
+        assert_array_almost_equal(data['O']['p'], 1.65 * np.arange(1, 6))
+
     def test_read_raman(self):
         raman_path = path_join(test_dir, 'CaF2', 'raman_lda_500.dat')
         raman_data = np.array([[3.45589820e+02, 9.89999400e-01],
@@ -220,20 +502,37 @@ class test_io_functions(unittest.TestCase):
         self.assertNotIn('f(down)', data.dtype.names)
         self.assertAlmostEqual(data['f'][1], 1.1)
 
-    @unittest.skipUnless(has_pymatgen, "requires pymatgen")
     def test_read_vasprun_totaldos(self):
         vr_path = path_join(test_dir, 'MgO', 'vasprun.xml.gz')
         data = galore.formats.read_vasprun_totaldos(vr_path)
         self.assertEqual(data[150, 0], -17.2715)
         self.assertEqual(data[195, 1], 16.8066)
 
-    @unittest.skipUnless(has_pymatgen, "requires pymatgen")
     def test_read_vasprun_pdos(self):
         vr_path = path_join(test_dir, 'MgO', 'vasprun.xml.gz')
         pdos = galore.formats.read_vasprun_pdos(vr_path)
         self.assertEqual(pdos['Mg']['s'][150], 0.053)
         self.assertEqual(pdos['O']['p'][189], 0.004)
 
+    @unittest.skipUnless(has_pymatgen, "requires pymatgen")
+    def test_read_vasprun_pymatgen(self):
+        """Check streamed vasprun data matches pymatgen parser"""
+        from pymatgen.io.vasp.outputs import Vasprun
+        vr_path = path_join(test_dir, 'SnO2', 'vasprun.xml.gz')
+        dos = galore.formats.read_vasprun(vr_path)
+        data = galore.formats.read_vasprun_dos(vr_path)
+        self.assertAlmostEqual(data['efermi'], Vasprun(vr_path).efermi)
+        numpy.testing.assert_allclose(data['energies'], dos.energies)
+
+        pdos = galore.formats.read_vasprun_pdos(vr_path)
+        reference = galore.formats.read_vasprun_pdos(dos)
+        self.assertEqual(list(pdos), list(reference))
+        for element, orbitals in reference.items():
+            self.assertEqual(list(pdos[element]), list(orbitals))
+            for orbital, values in orbitals.items():
+                numpy.testing.assert_allclose(pdos[element][orbital], values,
+                                              atol=1e-10)
+
     @unittest.skipUnless(has_pymatgen, "requires pymatgen")
     def test_identify_complete_dos(self):
         from monty.serialization import loadfn
@@ -0,0 +1,87 @@
+import os
+from os.path import join as path_join
+import shutil
+import tempfile
+import unittest
+
+from numpy.testing import assert_array_equal
+
+import galore
+import galore.cache
+import galore.formats
+
+test_dir = os.path.abspath(os.path.dirname(__file__))
+
+
+class test_cache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.calls = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def counting_reader(self, reader):
+        def read(filename, **kwargs):
+            self.calls += 1
+            return reader(filename, **kwargs)
+        read.__qualname__ = reader.__qualname__
+        return read
+
+    def test_cached_array(self):
+        doscar = path_join(test_dir, 'DOSCAR.1')
+        reader = self.counting_reader(galore.formats.read_doscar)
+        for _ in range(2):
+            data = galore.cache.cached_read(reader, doscar,
+                                            cache_dir=self.cache_dir)
+            assert_array_equal(data, galore.formats.read_doscar(doscar))
+        self.assertEqual(self.calls, 1)
+
+        # Hashing contents gives a separate entry
+        galore.cache.cached_read(reader, doscar, cache_dir=self.cache_dir,
+                                 hash_content=True)
+        self.assertEqual(self.calls, 2)
+
+    def test_cached_pdos(self):
+        doscar = path_join(test_dir, 'DOSCAR_pdos', 'DOSCAR')
+        reference = galore.formats.read_doscar_pdos(doscar)
+        reference['Zn']['f'] = None
+
+        def reader(filename):
+            self.calls += 1
+            return reference
+
+        for _ in range(2):
+            data = galore.cache.cached_read(reader, doscar,
+                                            cache_dir=self.cache_dir)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(list(data), list(reference))
+        self.assertIsNone(data['Zn']['f'])
+        for element, orbitals in reference.items():
+            self.assertEqual(list(data[element]), list(orbitals))
+            assert_array_equal(data[element]['p'], orbitals['p'])
+
+    def test_evict(self):
+        for i in range(4):
+            with open(path_join(self.cache_dir, '{0}.npz'.format(i)),
+                      'wb') as f:
+                f.write(b'0' * 100)
+            os.utime(f.name, ns=(i * 10**9, i * 10**9))
+
+        galore.cache.evict(self.cache_dir, max_size=250)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)),
+                         ['2.npz', '3.npz'])
+
+    def test_process_1d_data(self):
+        csv = path_join(test_dir, 'test_xy_data.csv')
+        results = [galore.process_1d_data(input=csv, gaussian=2.,
+                                          cache_dir=self.cache_dir)[1]
+                   for _ in range(2)]
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        assert_array_equal(*results)
+        assert_array_equal(results[0],
+                           galore.process_1d_data(input=csv, gaussian=2.)[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
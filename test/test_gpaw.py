@@ -4,6 +4,8 @@ from pathlib import Path
 import sys
 import unittest
 
+import numpy as np
+
 from galore.formats import read_gpaw_totaldos, read_gpaw_pdos
 
 try:
@@ -27,6 +29,11 @@ def stdout_redirect():
         output.close()
 
 
+def _integrate(x, y):
+    """Trapezoidal integral of y over x"""
+    return np.sum(0.5 * np.diff(x) * (y[1:] + y[:-1]))
+
+
 @unittest.skipIf(not has_gpaw, "GPAW not available")
 class TestGPAW(unittest.TestCase):
     gpaw_file = Path(__file__).parent / 'CdTe/CdTe.gpw'
@@ -71,14 +78,59 @@ class TestGPAW(unittest.TestCase):
             self.assertIn(column, pdos['Cd'])
         for species in ('Cd', 'Te'):
             self.assertIsNone(pdos[species]['f'])
-        self.assertAlmostEqual(max(pdos['Cd']['s']), 0.00295165, places=6,
+        # Reference value is for the sum of species, which were previously
+        # accumulated into shared arrays
+        self.assertAlmostEqual(max(pdos['Cd']['s'] + pdos['Te']['s']),
+                               0.00295165, places=6,
                                msg="PDOS value doesn't match reference")
+        self.assertFalse((pdos['Cd']['s'] == pdos['Te']['s']).all(),
+                         msg="PDOS of different species should not match")
         self.assertAlmostEqual(pdos['Cd']['energy'][100], -9.5542409,
                                places=6,
                                msg="PDOS energy value doesn't match reference")
         self.assertTrue((pdos['Cd']['energy'] == pdos['Te']['energy']).all(),
                         msg="PDOS energy ranges not consistent")
 
+    def test_tdos_mesh(self):
+        """Check TDOS evaluated on output mesh conserves total weight"""
+        with stdout_redirect() as stdout:
+            tdos = read_gpaw_totaldos(self.gpaw_file)
+            tdos_mesh = read_gpaw_totaldos(self.gpaw_file, sampling=0.01)
+            tdos_range = read_gpaw_totaldos(self.gpaw_file, sampling=0.01,
+                                            xmin=-2., xmax=1.)
+        self.assertAlmostEqual(tdos_mesh[:, 1].sum() * 0.01,
+                               _integrate(tdos[:, 0], tdos[:, 1]), places=4)
+        self.assertTrue((tdos_range[:, 0] == np.arange(-2., 1., 0.01)).all())
+
+    def test_pdos_mesh(self):
+        """Check PDOS evaluated on output mesh conserves total weight"""
+        with stdout_redirect() as stdout:
+            pdos = read_gpaw_pdos(self.gpaw_file)
+            pdos_mesh = read_gpaw_pdos(self.gpaw_file, sampling=0.01)
+        for species, orbitals in pdos.items():
+            for orbital, values in orbitals.items():
+                if orbital == 'energy':
+                    continue
+                elif values is None:
+                    self.assertIsNone(pdos_mesh[species][orbital])
+                else:
+                    self.assertAlmostEqual(
+                        pdos_mesh[species][orbital].sum() * 0.01,
+                        _integrate(orbitals['energy'], values), places=4)
+
+    def test_pdos_nproc(self):
+        """Check PDOS is unchanged when atoms are divided between processes"""
+        with stdout_redirect() as stdout:
+            pdos_serial = read_gpaw_pdos(self.gpaw_file, npts=1000)
+            pdos_parallel = read_gpaw_pdos(self.gpaw_file, npts=1000, nproc=2)
+        for species, orbitals in pdos_serial.items():
+            for orbital, values in orbitals.items():
+                if values is None:
+                    self.assertIsNone(pdos_parallel[species][orbital])
+                else:
+                    self.assertTrue(
+                        (pdos_parallel[species][orbital] == values).all())
+
     def test_pdos_refs(self):
         """Check GPAW PDOS energy alignment options"""
         with stdout_redirect() as stdout:
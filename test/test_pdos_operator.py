@@ -0,0 +1,77 @@
+from pathlib import Path
+import shutil
+import tempfile
+import unittest
+
+from numpy.testing import assert_allclose
+
+import galore
+import galore.formats
+from galore.pdos_operator import (apply_pdos_operator,
+                                  compile_pdos_operator,
+                                  load_pdos_operator, save_pdos_operator)
+
+
+class test_pdos_operator(unittest.TestCase):
+    def setUp(self):
+        self.vasprun = str(
+            (Path(__file__).parent / 'SnO2/vasprun.xml.gz').resolve())
+        self.pdos_data = galore.formats.read_vasprun_pdos(self.vasprun)
+        self.energies = self.pdos_data['O']['energy']
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def assert_pdos_equal(self, result, reference):
+        self.assertEqual(list(result), list(reference))
+        for element, orbitals in reference.items():
+            self.assertEqual(list(result[element]), list(orbitals))
+            for orbital, values in orbitals.items():
+                assert_allclose(result[element][orbital], values,
+                                rtol=1e-10, atol=1e-10 * values.max())
+
+    def test_operator(self):
+        """Check compiled operator matches process_pdos"""
+        settings = dict(gaussian=0.3, lorentzian=0.2, xmin=-10, xmax=4,
+                        weighting='alka')
+        reference = galore.process_pdos(input=[self.vasprun], **settings)
+        operator = compile_pdos_operator(self.energies,
+                                         elements=self.pdos_data.keys(),
+                                         **settings)
+        self.assert_pdos_equal(apply_pdos_operator(operator, self.pdos_data),
+                               reference)
+
+        # Direct convolution is compiled as FFT with the same result
+        reference = galore.process_pdos(input=[self.vasprun], method='direct',
+                                        **settings)
+        operator = compile_pdos_operator(self.energies,
+                                         elements=self.pdos_data.keys(),
+                                         method='direct', **settings)
+        self.assert_pdos_equal(apply_pdos_operator(operator, self.pdos_data),
+                               reference)
+
+    def test_operator_file(self):
+        """Check compiled operator is unchanged by writing to file"""
+        for settings in (dict(gaussian=0.3, weighting='he2'),
+                         dict(lorentzian=0.2, method='analytic'),
+                         dict()):
+            operator = compile_pdos_operator(self.energies,
+                                             elements=self.pdos_data.keys(),
+                                             **settings)
+            filename = str(Path(self.tempdir) / 'operator.npz')
+            save_pdos_operator(operator, filename)
+            self.assert_pdos_equal(
+                apply_pdos_operator(load_pdos_operator(filename),
+                                    self.pdos_data),
+                apply_pdos_operator(operator, self.pdos_data))
+
+    def test_operator_energies(self):
+        """Check error is raised for data on a different grid"""
+        operator = compile_pdos_operator(self.energies[1:], gaussian=0.3)
+        with self.assertRaises(ValueError):
+            apply_pdos_operator(operator, self.pdos_data)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,9 @@
 from pathlib import Path
 import unittest
+from unittest.mock import patch
 
 import numpy as np
-from numpy.testing import assert_array_almost_equal
+from numpy.testing import assert_allclose, assert_array_almost_equal
 
 import galore
 
@@ -27,6 +28,242 @@ class test_process_pdos(unittest.TestCase):
                 0.00595715, 1.60246962, 3.19897467, 4.7825862, 0.01190685, 0.
             ]))
 
+    def test_broaden_fft(self):
+        """Check FFT convolution matches direct convolution"""
+        data = np.random.RandomState(1).rand(500)
+        for dist in ('lorentzian', 'gaussian'):
+            direct = galore.broaden(data, d=0.1, dist=dist, width=1.5,
+                                    method='direct')
+            fft = galore.broaden(data, d=0.1, dist=dist, width=1.5,
+                                 method='fft')
+            self.assertEqual(fft.shape, direct.shape)
+            assert_array_almost_equal(fft, direct, decimal=10)
+
+    def test_broaden_voigt(self):
+        """Check Voigt broadening matches Lorentzian then Gaussian"""
+        data = np.random.RandomState(1).rand(500)
+        sequential = galore.broaden(
+            galore.broaden(data, d=0.1, dist='lorentzian', width=1.5),
+            d=0.1, dist='gaussian', width=0.8)
+        voigt = galore.broaden(data, d=0.1, dist='voigt', width=(1.5, 0.8))
+        self.assertEqual(voigt.shape, sequential.shape)
+        # Away from the edges, where Gaussian kernel reaches beyond the data
+        assert_array_almost_equal(voigt[200:-200], sequential[200:-200],
+                                  decimal=10)
+
+    def test_broaden_channels(self):
+        """Check 2D data is broadened row-by-row"""
+        data = np.random.RandomState(2).rand(3, 400)
+        for method in ('direct', 'fft'):
+            broadened = galore.broaden(data, d=0.1, dist='voigt',
+                                       width=(0.5, 1.2), method=method)
+            self.assertEqual(broadened.shape, data.shape)
+            for row, row_data in zip(broadened, data):
+                assert_array_almost_equal(
+                    row, galore.broaden(row_data, d=0.1, dist='voigt',
+                                        width=(0.5, 1.2)), decimal=10)
+
+    def test_kernel_cache(self):
+        """Check broadening kernels are reused and cache can be cleared"""
+        galore.clear_kernel_cache()
+        data = np.random.RandomState(3).rand(300)
+        first = galore.broaden(data, d=0.1, dist='gaussian', width=0.7,
+                               method='fft')
+        second = galore.broaden(data, d=0.1, dist='gaussian', width=0.7,
+                                method='fft')
+        assert_array_almost_equal(first, second)
+
+        info = galore.kernel_cache_info()
+        self.assertEqual(info['kernel'].misses, 1)
+        self.assertGreaterEqual(info['kernel'].hits, 1)
+        self.assertEqual(info['fft'].misses, 1)
+        self.assertEqual(info['fft'].hits, 1)
+
+        galore.clear_kernel_cache()
+        self.assertEqual(galore.kernel_cache_info()['kernel'].currsize, 0)
+
+        # Variable-width broadening does not evict fixed-width kernels
+        x_values = np.arange(0, 30, 0.1)
+        galore.broaden(data, d=0.1, dist='gaussian', width=0.7, method='fft')
+        for _ in range(2):
+            galore.broaden(data, d=0.1, dist='gaussian', method='fft',
+                           width=galore.polynomial_width(0.1, [0.5]),
+                           x_values=x_values)
+        galore.broaden(data, d=0.1, dist='gaussian', width=0.7, method='fft')
+        info = galore.kernel_cache_info()
+        self.assertEqual(info['kernel'].misses, 1)
+        self.assertEqual(info['fft'].misses, 1)
+        self.assertEqual(info['fft'].hits, 1)
+
+        # Transforms above the size limit are not cached
+        galore.clear_kernel_cache()
+        with patch.object(galore, 'KERNEL_CACHE_MAX_BYTES', 1024):
+            for method in ('fft', 'analytic'):
+                assert_array_almost_equal(
+                    galore.broaden(data, d=0.1, dist='gaussian', width=0.7,
+                                   method=method), first, decimal=10)
+        info = galore.kernel_cache_info()
+        self.assertEqual(info['fft'].currsize, 0)
+        self.assertEqual(info['transfer'].currsize, 0)
+        self.assertEqual(info['uncached'], {'fft': 1, 'transfer': 1})
+
+    def test_broaden_lines(self):
+        """Check direct line summation matches spikes with convolution"""
+        x_values = np.arange(0, 100, 0.5)
+        lines = np.array([[20., 1.], [50., 2.], [70.5, 0.5], [120., 1.]])
+        for dist, width in (('lorentzian', 2.), ('gaussian', 3.),
+                            ('voigt', (2., 3.))):
+            direct = galore.broaden_lines(lines, x_values,
+                                          dist=dist, width=width)
+            convolved = galore.broaden(
+                galore.xy_to_1d(lines, x_values, spikes=True),
+                d=0.5, dist=dist, width=width)
+            assert_allclose(direct, convolved, atol=(2e-3 * max(convolved)))
+
+        # Line positions are not rounded to the mesh
+        broadened = galore.broaden_lines(np.array([[50.2, 1.]]), x_values,
+                                         dist='gaussian', width=2.)
+        self.assertAlmostEqual(broadened[100], galore.gaussian(0.2, fwhm=2.))
+
+    def test_broaden_variable_width(self):
+        """Check energy-dependent broadening against direct summation"""
+        d = 0.05
+        x_values = np.arange(-5, 5, d)
+        data = np.random.RandomState(4).rand(len(x_values))
+        width_function = galore.polynomial_width(0.2, [0.1, 0.02])
+        widths = width_function(x_values)
+
+        broadened = galore.broaden(data, d=d, dist='lorentzian',
+                                   width=width_function, x_values=x_values)
+        reference = np.array([
+            np.sum(data * galore.lorentzian(x - x_values, fwhm=widths))
+            for x in x_values])
+        assert_allclose(broadened, reference, atol=(1e-3 * max(reference)))
+
+        # Constant widths match the fixed-width result
+        assert_array_almost_equal(
+            galore.broaden(data, d=d, dist='gaussian',
+                           width=np.full(len(x_values), 0.3)),
+            galore.broaden(data, d=d, dist='gaussian', width=0.3),
+            decimal=10)
+
+        # Extending the data range does not change the broadened values,
+        # beyond the interpolation between width levels
+        x_extended = np.arange(-5, 15, d)
+        data_extended = np.zeros(len(x_extended))
+        data_extended[:len(data)] = data
+        width_function = galore.polynomial_width(0.2, [0.1])
+        assert_allclose(
+            galore.broaden(data_extended, d=d, dist='gaussian',
+                           width=width_function,
+                           x_values=x_extended)[:len(data)],
+            galore.broaden(data, d=d, dist='gaussian', width=width_function,
+                           x_values=x_values),
+            rtol=1e-3)
+
+    def test_broaden_tolerance(self):
+        """Check kernel truncation follows the requested tolerance"""
+        d, width = 0.01, 0.5
+        data = np.zeros(200001)
+        data[100000] = 1.
+        # Area of broadening functions sampled with spacing d
+        areas = {'lorentzian': 1 / d,
+                 'gaussian': (width / (2 * np.sqrt(2 * np.log(2)))
+                              * np.sqrt(2 * np.pi) / d)}
+        for dist, area in areas.items():
+            truncated = galore.broaden(data, d=d, dist=dist, width=width,
+                                       tolerance=1e-3)
+            lost = 1 - truncated.sum() / area
+            self.assertLess(lost, 1e-3)
+            self.assertGreater(lost, 1e-4)
+
+        # Gaussian kernels are much shorter than the default 20 * width
+        self.assertLess(galore._kernel_pad('gaussian', width, d=d,
+                                           tolerance=1e-6),
+                        5 * width)
+
+    def test_broaden_analytic(self):
+        """Check Fourier-space broadening with analytic transforms"""
+        data = np.random.RandomState(5).rand(2, 1000)
+        assert_array_almost_equal(
+            galore.broaden(data, d=0.01, dist='gaussian', width=0.3,
+                           method='analytic'),
+            galore.broaden(data, d=0.01, dist='gaussian', width=0.3,
+                           method='fft'), decimal=10)
+
+        # Lorentzian is not truncated
+        x_values = np.arange(-10, 10, 0.01)
+        data = np.zeros(len(x_values))
+        data[1000] = 1.
+        broadened = galore.broaden(data, d=0.01, dist='lorentzian',
+                                   width=0.5, method='analytic')
+        assert_allclose(broadened, galore.lorentzian(x_values, fwhm=0.5),
+                        atol=2e-3)
+
+        # Padding is limited to the data length, so a very wide Lorentzian
+        # wraps around a mesh of twice the data length and is nearly flat
+        broadened = galore.broaden(data, d=0.01, dist='lorentzian',
+                                   width=1000, method='analytic')
+        assert_allclose(broadened, 1 / (2 * len(data) * 0.01), rtol=1e-3)
+
+    def test_broaden_sweep(self):
+        """Check width sweep matches individual broadenings"""
+        data = np.random.RandomState(6).rand(800)
+        sweep = galore.broaden_sweep(data, d=0.1, gaussians=[0.5, 1.2, 0],
+                                     lorentzians=[0.3, 0, 0.7])
+        self.assertEqual(sweep.shape, (3, 800))
+        for row, (dist, width) in zip(sweep, (('voigt', (0.3, 0.5)),
+                                              ('gaussian', 1.2),
+                                              ('lorentzian', 0.7))):
+            assert_array_almost_equal(
+                row, galore.broaden(data, d=0.1, dist=dist, width=width),
+                decimal=10)
+
+    def test_broaden_float32(self):
+        """Check single-precision broadening matches double precision"""
+        data = np.random.RandomState(7).rand(2, 600)
+        for method in ('direct', 'fft', 'analytic'):
+            for dist, width in (('lorentzian', 0.8), ('voigt', (0.3, 0.5))):
+                reference = galore.broaden(data, d=0.1, dist=dist,
+                                           width=width, method=method)
+                single = galore.broaden(data.astype(np.float32), d=0.1,
+                                        dist=dist, width=width, method=method)
+                self.assertEqual(single.dtype, np.float32)
+                assert_allclose(single, reference, rtol=1e-5,
+                                atol=1e-5 * reference.max())
+
+        widths = np.linspace(0.3, 1.5, 600)
+        single = galore.broaden(data, d=0.1, width=widths, dtype='float32')
+        self.assertEqual(single.dtype, np.float32)
+        reference = galore.broaden(data, d=0.1, width=widths)
+        assert_allclose(single, reference, rtol=1e-5,
+                        atol=1e-5 * reference.max())
+
+    def test_broaden_out(self):
+        """Check broadening into a preallocated or the input array"""
+        data = np.random.RandomState(8).rand(3, 500)
+        for width in (0.6, (0.3, 0.4), np.linspace(0.2, 1., 500)):
+            dist = 'voigt' if isinstance(width, tuple) else 'lorentzian'
+            reference = galore.broaden(data, d=0.1, dist=dist, width=width)
+            out = np.empty_like(data)
+            result = galore.broaden(data, d=0.1, dist=dist, width=width,
+                                    out=out)
+            self.assertIs(result, out)
+            assert_array_almost_equal(out, reference)
+
+            in_place = data.copy()
+            galore.broaden(in_place, d=0.1, dist=dist, width=width,
+                           out=in_place)
+            assert_array_almost_equal(in_place, reference)
+
+    def test_voigt(self):
+        self.assertAlmostEqual(galore.voigt(0.4, f0=0.1, fwhm_l=0.5,
+                                            fwhm_g=0.3),
+                               galore.voigt(-0.2, f0=0.1, fwhm_l=0.5,
+                                            fwhm_g=0.3))
+        self.assertAlmostEqual(galore.voigt(0., fwhm_l=1e-8, fwhm_g=0.3),
+                               galore.gaussian(0., fwhm=0.3), places=6)
+
     def test_process_pdos(self):
         vasprun = str(
             (Path(__file__).parent / 'SnO2/vasprun.xml.gz').resolve())
@@ -41,6 +278,15 @@ class test_process_pdos(unittest.TestCase):
                                             weighting=weighting)
         self.assertEqual(plotting_data['O']['energy'][0], -10.0)
 
+    def test_process_pdos_doscar(self):
+        doscar = str(
+            (Path(__file__).parent / 'DOSCAR_pdos/DOSCAR').resolve())
+        plotting_data = galore.process_pdos(input=doscar, sampling=0.5,
+                                            xmin=-2, xmax=2.1)
+        self.assertEqual(list(plotting_data), ['Zn', 'O'])
+        assert_array_almost_equal(plotting_data['O']['s'],
+                                  0.15 * np.arange(1, 5.5, 0.5))
+
 
 if __name__ == '__main__':
     unittest.main()